@@ -1,10 +1,19 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+import json
 import logging
+import os
+import queue
 from pathlib import Path
 from backend.city_layout import CityLayout
-from backend.layout_storage import LayoutStorage
+from backend.game_data import get_game_data
+from backend.jobs import CANCELLED, DONE, FINISHED, JobQueue, QueueFull
+from backend.layout_storage import MAX_RADIUS, LayoutStorage
 from backend.optimizer import CityOptimizer
+from backend.multi_city import CityPlan, MultiCityOptimizer
+from backend.result_cache import ResultCache, cached_optimize
+from backend.singleflight import Singleflight
+from backend.yield_table import table_for
 from interface import generate_all_tiles, build_svg, main_route as render_interface
 
 app = Flask(__name__)
@@ -17,7 +26,66 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-storage = LayoutStorage()
+# Layouts reaching past MAX_GRID_RADIUS rings are rejected
+storage = LayoutStorage(max_radius=int(os.environ.get('MAX_GRID_RADIUS', MAX_RADIUS)))
+# Finished optimize results; set RESULT_CACHE_DIR to keep them across restarts
+result_cache = ResultCache(
+    max_bytes=int(os.environ.get('RESULT_CACHE_BYTES', 64 * 1024 * 1024)),
+    disk_dir=os.environ.get('RESULT_CACHE_DIR'),
+    max_disk_bytes=int(os.environ.get('RESULT_CACHE_DISK_BYTES', 256 * 1024 * 1024))
+)
+# Identical concurrent /api/optimize requests share one search. With a disk
+# cache tier, workers on the host coordinate through lock files next to it
+# and pick up each other's results from it
+optimize_flight = Singleflight(
+    lock_dir=result_cache.disk_dir / 'inflight' if result_cache.disk_dir else None
+)
+# Background optimizations for /api/jobs
+job_queue = JobQueue(
+    max_workers=int(os.environ.get('JOB_WORKERS', 2)),
+    max_pending=int(os.environ.get('JOB_QUEUE_SIZE', 32))
+)
+# Longest wait between events on /api/optimize_stream
+STREAM_POLL_SECONDS = 0.25
+# Parse and compile the rule files once, before the first request
+get_game_data()
+
+def _result_dicts(results):
+    """OptimizationResults as JSON-ready dicts"""
+    return [
+        {
+            "building": r.building,
+            "position": r.position,
+            "yields": r.yields,
+            "score": r.score
+        }
+        for r in results
+    ]
+
+def _city_layout(hex_data):
+    """A single city's layout; its center (0,0) holds the palace"""
+    return storage.create_city_layout(hex_data, reserved=[(0, 0)])
+
+def _optimize_options(data):
+    """Engine options of an optimize request body"""
+    return dict(
+        strategy=data.get('strategy', 'backtracking'),
+        time_budget_ms=data.get('time_budget_ms', 1000),
+        seed=data.get('seed'),
+        workers=int(data.get('workers', 1))
+    )
+
+def _optimize_job(city, buildings, priorities, options, optimizer):
+    """A job_queue callable running a cached optimize, with a JSON-ready result"""
+    def run():
+        results, pruned_nodes, cached = cached_optimize(
+            result_cache, city, buildings, priorities, optimizer=optimizer, **options
+        )
+        return {"results": _result_dicts(results), "pruned_nodes": pruned_nodes, "cached": cached}
+    return run
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
 
 @app.route('/')
 def index():
@@ -47,37 +115,238 @@ def optimize():
         hex_data = data.get('hexes', {})
         buildings = data.get('buildings', [])
         priorities = data.get('priorities', {})
+        options = _optimize_options(data)
 
         # Create CityLayout from hex data
-        city = storage.create_city_layout(hex_data)
+        city = _city_layout(hex_data)
 
-        # Instantiate the backtracking optimizer
+        # Static yields are only compiled on a cache miss, once per terrain
+        # layout, so a request that only changes priorities re-weights the table
         optimizer = CityOptimizer(city)
 
-        # Run global optimization
-        results = optimizer.optimize_multiple_buildings(buildings, priorities)
+        # Run global optimization, unless an equivalent request was answered before
+        results, pruned_nodes, cached = cached_optimize(
+            result_cache,
+            city,
+            buildings,
+            priorities,
+            optimizer=optimizer,
+            flight=optimize_flight,
+            **options
+        )
 
         # Log the optimization request
         logging.info(f"Optimization request - Buildings: {buildings}, "
-                     f"Priorities: {priorities}")
-
-        # Convert results for JSON response
-        output = []
-        for r in results:
-            output.append({
-                "building": r.building,
-                "position": r.position,
-                "yields": r.yields,
-                "score": r.score
-            })
+                     f"Priorities: {priorities}, Strategy: {options['strategy']}, Cached: {cached}")
 
         return jsonify({
             "status": "success",
-            "results": output
+            "results": _result_dicts(results),
+            "pruned_nodes": pruned_nodes,
+            "cached": cached
         })
     except Exception as e:
         logging.exception("Error in optimization")  # logs the entire traceback
         return jsonify({"status": "error", "message": str(e)}), 400
 
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue an optimization (same body as /api/optimize) and return its job ID"""
+    try:
+        data = request.json
+        hex_data = data.get('hexes', {})
+        buildings = data.get('buildings', [])
+        priorities = data.get('priorities', {})
+        options = _optimize_options(data)
+
+        city = _city_layout(hex_data)
+        optimizer = CityOptimizer(city)
+
+        job = job_queue.submit(optimizer, _optimize_job(city, buildings, priorities, options, optimizer))
+        logging.info(f"Queued optimization job {job.id} - Buildings: {buildings}, "
+                     f"Priorities: {priorities}, Strategy: {options['strategy']}")
+        return jsonify({"status": "success", "job_id": job.id, "job": job.to_dict()}), 202
+    except QueueFull as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    except Exception as e:
+        logging.exception("Error queueing optimization")
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status, progress (nodes explored, best score so far) and result of a job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Unknown job {job_id}"}), 404
+    return jsonify({"status": "success", "job": job.to_dict()})
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Unknown job {job_id}"}), 404
+    logging.info(f"Cancel requested for optimization job {job_id}")
+    return jsonify({"status": "success", "job": job.to_dict()})
+
+@app.route('/api/optimize_stream', methods=['POST'])
+def optimize_stream():
+    """
+    Run an optimization as a job and stream it as server-sent events: "job"
+    (its ID, for DELETE /api/jobs/<id>), then "incumbent" each time the
+    search finds a better arrangement and "progress" while it does not, and
+    finally "done" (same result as /api/optimize), "cancelled" or "error".
+    Disconnecting cancels the search.
+    """
+    try:
+        data = request.json
+        hex_data = data.get('hexes', {})
+        buildings = data.get('buildings', [])
+        priorities = data.get('priorities', {})
+        options = _optimize_options(data)
+
+        city = _city_layout(hex_data)
+        optimizer = CityOptimizer(city)
+        # The search keeps changing `city`, so incumbents are described on a copy
+        viewer = CityOptimizer(city.clone())
+        incumbents = queue.Queue()
+        optimizer.incumbent_callback = lambda score, arrangement: incumbents.put((score, list(arrangement)))
+
+        optimize_job = _optimize_job(city, buildings, priorities, options, optimizer)
+
+        def run():
+            try:
+                return optimize_job()
+            finally:
+                incumbents.put(None)  # wakes the stream as soon as the search returns
+
+        job = job_queue.submit(optimizer, run)
+        logging.info(f"Streaming optimization job {job.id} - Buildings: {buildings}, "
+                     f"Priorities: {priorities}, Strategy: {options['strategy']}")
+    except QueueFull as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    except Exception as e:
+        logging.exception("Error starting optimization stream")
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    def events():
+        last_progress = None
+        try:
+            yield _sse("job", {"job_id": job.id})
+            while True:
+                # Everything the search reported comes before it finishes
+                finished = job.status in FINISHED
+                items = []
+                try:
+                    if not finished:
+                        items.append(incumbents.get(timeout=STREAM_POLL_SECONDS))
+                    while True:
+                        items.append(incumbents.get_nowait())
+                except queue.Empty:
+                    pass
+                if None in items:
+                    # The search returned; the job records how in a moment
+                    job.wait()
+                    finished = True
+                # Only the newest of a burst is worth describing
+                latest = next((item for item in reversed(items) if item is not None), None)
+
+                if latest is not None:
+                    score, arrangement = latest
+                    yield _sse("incumbent", {
+                        "score": score,
+                        "results": _result_dicts(viewer.arrangement_results(arrangement, priorities)),
+                        "progress": job.progress
+                    })
+                elif job.progress != last_progress:
+                    yield _sse("progress", job.progress)
+                last_progress = job.progress
+
+                if finished:
+                    if job.status == DONE:
+                        yield _sse("done", {"status": "success", **job.result})
+                    elif job.status == CANCELLED:
+                        yield _sse("cancelled", {"job_id": job.id})
+                    else:
+                        yield _sse("error", {"status": "error", "message": job.error})
+                    return
+        finally:
+            # Client went away (or the stream ended): stop a search nobody is watching
+            job_queue.cancel(job.id)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/cache_stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters and size of the optimize result cache, and request coalescing counters"""
+    return jsonify({
+        "status": "success",
+        "result_cache": result_cache.stats(),
+        "singleflight": optimize_flight.stats()
+    })
+
+@app.route('/api/optimize_building', methods=['POST'])
+def optimize_building():
+    """Rank the best tiles for one more building on the current layout"""
+    try:
+        data = request.json
+        hex_data = data.get('hexes', {})
+        building = data.get('building')
+        # Omitted priorities weigh every yield equally
+        priorities = data.get('priorities')
+        top_k = int(data.get('top_k', 5))
+
+        city = _city_layout(hex_data)
+        optimizer = CityOptimizer(city)
+        results = optimizer.rank_building_placements(building, priorities, top_k=top_k)
+
+        logging.info(f"Placement request - Building: {building}, Priorities: {priorities}")
+
+        return jsonify({"status": "success", "results": _result_dicts(results)})
+    except Exception as e:
+        logging.exception("Error in placement ranking")
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+@app.route('/api/optimize_region', methods=['POST'])
+def optimize_region():
+    """Jointly optimize several cities placed on one board"""
+    try:
+        data = request.json
+        hex_data = data.get('hexes', {})
+        priorities = data.get('priorities', {})
+        options = _optimize_options(data)
+
+        # Each city: {"name", "center": [ring, index], "buildings", optional "radius"}
+        plans = [
+            CityPlan(
+                name=c['name'],
+                center=tuple(c['center']),
+                buildings=c.get('buildings', []),
+                radius=int(c.get('radius', 3))
+            )
+            for c in data.get('cities', [])
+        ]
+
+        # Every city's center holds its palace; no other tile is reserved
+        board = storage.create_city_layout(hex_data, reserved=[plan.center for plan in plans])
+        every_building = [b for plan in plans for b in plan.buildings]
+        optimizer = MultiCityOptimizer(board, table_for(board, every_building))
+        result = optimizer.optimize(plans, priorities, **options)
+
+        logging.info(f"Region optimization request - Cities: {[p.name for p in plans]}, "
+                     f"Priorities: {priorities}, Strategy: {options['strategy']}")
+
+        return jsonify({
+            "status": "success",
+            "results": {name: _result_dicts(results) for name, results in result.placements.items()},
+            "score": result.score,
+            "clusters": result.clusters,
+            "pruned_nodes": result.pruned_nodes
+        })
+    except Exception as e:
+        logging.exception("Error in region optimization")
+        return jsonify({"status": "error", "message": str(e)}), 400
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,105 @@
+# adjacency_rules.py
+
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+import numpy as np
+from backend.bitboard import SOURCE_ALIASES, Bitboard, popcount
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """One `adjacency_rules` entry with its sources resolved."""
+    sources: Tuple[str, ...]       # as written in buildings.json
+    terrains: FrozenSet[str]       # terrain types that match, aliases expanded
+    features: FrozenSet[str]       # features that match
+    # Nonzero bonus per match as (yield column, value) pairs
+    bonus: Tuple[Tuple[int, float], ...]
+
+    def mask(self, board: Bitboard) -> int:
+        """Tiles of `board` this rule counts."""
+        mask = 0
+        for terrain_type in self.terrains:
+            mask |= board.terrain.get(terrain_type, 0)
+        for feature in self.features:
+            mask |= board.features.get(feature, 0)
+        return mask
+
+class AdjacencyProgram:
+    """
+    A building's adjacency rules compiled once: source names resolved to
+    terrain/feature sets and bonuses turned into yield-column pairs. The
+    source masks for a layout are built on first use and cached on its
+    Bitboard until the terrain changes, so evaluating a tile is one AND +
+    popcount per rule with no string matching.
+
+    Programs are immutable and shared by every layout using the same data.
+    """
+
+    __slots__ = ("rules", "n_yields")
+
+    def __init__(self, rules: Sequence[CompiledRule], n_yields: int):
+        self.rules: Tuple[CompiledRule, ...] = tuple(rules)
+        self.n_yields = n_yields
+
+    def evaluate(self, board: Bitboard, tile: int) -> List[float]:
+        """Adjacency yields at bit `tile` of `board`, along the compile-time yield order."""
+        result = [0.0] * self.n_yields
+        area = board.closed_neighbourhood(tile)
+        for rule, mask in zip(self.rules, board.rule_masks(self)):
+            matches = popcount(area & mask)
+            if matches:
+                for column, value in rule.bonus:
+                    result[column] += value * matches
+        return result
+
+    def evaluate_all(self, board: Bitboard) -> np.ndarray:
+        """
+        (tiles, yields) adjacency yields for every tile of `board` at once.
+        Counts come from gathering each rule's match array over the
+        topology's neighbour index, so the cost is linear in the tile count.
+        """
+        n = len(board.positions)
+        result = np.zeros((n, self.n_yields))
+        neighbour_index = board.topology.neighbour_index
+        for rule, mask in zip(self.rules, board.rule_masks(self)):
+            if not rule.bonus or not mask:
+                continue
+            # Extra False slot for the neighbour index padding
+            matches = np.append(board.to_array(mask), False)
+            counts = matches[:n] + matches[neighbour_index].sum(axis=1)
+            for column, value in rule.bonus:
+                result[:, column] += value * counts
+        return result
+
+def compile_rule(rule: Dict, yield_order: Sequence[str]) -> CompiledRule:
+    columns = {y: k for k, y in enumerate(yield_order)}
+    sources = tuple(rule.get('sources', []))
+    terrains = set(sources)
+    for source in sources:
+        terrains.update(SOURCE_ALIASES.get(source, ()))
+
+    bonus = []
+    for yld_type, value in rule.get('bonus_yields', {}).items():
+        if yld_type not in columns:
+            raise ValueError(f"Unknown yield type in adjacency rule: {yld_type}")
+        if value:
+            bonus.append((columns[yld_type], float(value)))
+
+    return CompiledRule(
+        sources=sources,
+        terrains=frozenset(terrains),
+        features=frozenset(sources),
+        bonus=tuple(bonus)
+    )
+
+def compile_adjacency_rules(
+    building_data: Dict[str, Dict],
+    yield_order: Sequence[str]
+) -> Dict[str, AdjacencyProgram]:
+    """Compile every building's `adjacency_rules` into an AdjacencyProgram."""
+    return {
+        name: AdjacencyProgram(
+            [compile_rule(rule, yield_order) for rule in info.get('adjacency_rules', [])],
+            len(yield_order)
+        )
+        for name, info in building_data.items()
+    }
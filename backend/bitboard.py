@@ -0,0 +1,141 @@
+# bitboard.py
+
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+import numpy as np
+
+Position = Tuple[int, int]
+
+# Adjacency rule sources that stand for several terrain types
+SOURCE_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "coastal_tile": ("coast", "navigable_river", "coastal_lake"),
+}
+
+def popcount(mask: int) -> int:
+    """Number of set bits (int.bit_count needs Python 3.10)."""
+    return bin(mask).count("1")
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Indexes of the set bits, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+class Bitboard:
+    """
+    Integer bit masks over a layout's tiles, one bit per tile in the
+    layout's tile order (a 3-ring city's 37 tiles fit in a 64-bit word;
+    larger grids just use longer ints).
+
+    Holds one mask per terrain type and per feature, fresh water and
+    occupancy levels (at least one building / full); neighbourhoods come
+    from the shared HexTopology. Tile predicates then become AND, and "how
+    many tiles around here match" becomes AND + popcount. CityLayout keeps
+    it in sync on terrain and building edits.
+    """
+
+    def __init__(self, topology, blocked: Iterable[str] = ()):
+        self.topology = topology
+        # Terrain types (or features of the same name) no building may use
+        self.blocked_sources: Tuple[str, ...] = tuple(sorted(blocked))
+        self.positions: List[Position] = topology.positions
+        self.bit_index: Dict[Position, int] = topology.index
+        self.all_tiles = (1 << len(self.positions)) - 1
+
+        self.terrain: Dict[str, int] = {}
+        self.features: Dict[str, int] = {}
+        self.has_terrain = 0
+        self.fresh_water = 0
+        self.occupied = 0  # at least one building
+        self.full = 0      # two buildings
+        # Tiles taken by something other than buildings (the city center's palace)
+        self.reserved = 0
+
+        # Source masks per compiled adjacency program, dropped on terrain edits
+        self._rule_masks: Dict[Any, Tuple[int, ...]] = {}
+
+    def copy(self) -> "Bitboard":
+        """Independent copy; the topology and cached rule masks are shared until an edit."""
+        twin = Bitboard.__new__(Bitboard)
+        twin.__dict__.update(self.__dict__)
+        twin.terrain = dict(self.terrain)
+        twin.features = dict(self.features)
+        twin._rule_masks = dict(self._rule_masks)
+        return twin
+
+    def set_terrain(self, pos: Position, terrain_type: str, features: Iterable[str], has_fresh_water: bool):
+        bit = 1 << self.bit_index[pos]
+        self._rule_masks.clear()
+        for masks in (self.terrain, self.features):
+            for name in [n for n, m in masks.items() if m & bit]:
+                masks[name] &= ~bit
+                if not masks[name]:
+                    del masks[name]
+
+        if terrain_type:
+            self.terrain[terrain_type] = self.terrain.get(terrain_type, 0) | bit
+            self.has_terrain |= bit
+        else:
+            self.has_terrain &= ~bit
+        for feature in set(features):
+            self.features[feature] = self.features.get(feature, 0) | bit
+        if has_fresh_water:
+            self.fresh_water |= bit
+        else:
+            self.fresh_water &= ~bit
+
+    def set_occupancy(self, pos: Position, count: int):
+        bit = 1 << self.bit_index[pos]
+        self.occupied = self.occupied | bit if count >= 1 else self.occupied & ~bit
+        self.full = self.full | bit if count >= 2 else self.full & ~bit
+
+    def source_mask(self, source: str) -> int:
+        """Tiles matching one adjacency source: a terrain type, a feature or an alias."""
+        mask = self.terrain.get(source, 0) | self.features.get(source, 0)
+        for terrain_type in SOURCE_ALIASES.get(source, ()):
+            mask |= self.terrain.get(terrain_type, 0)
+        return mask
+
+    def sources_mask(self, sources: Iterable[str]) -> int:
+        """Tiles matching any of `sources`."""
+        mask = 0
+        for source in sources:
+            mask |= self.source_mask(source)
+        return mask
+
+    def rule_masks(self, program) -> Tuple[int, ...]:
+        """Source mask of each rule in an AdjacencyProgram, cached until the terrain changes."""
+        masks = self._rule_masks.get(program)
+        if masks is None:
+            masks = self._rule_masks[program] = tuple(rule.mask(self) for rule in program.rules)
+        return masks
+
+    def blocked_mask(self) -> int:
+        """Tiles no building can use: reserved tiles and blocked terrain (mountains)."""
+        return self.reserved | self.sources_mask(self.blocked_sources)
+
+    def placement_mask(self, requirements: Dict) -> int:
+        """Tiles meeting a building's placement requirements (occupancy ignored)."""
+        mask = self.has_terrain & ~self.blocked_mask()
+        if 'tile_type' in requirements:
+            allowed = 0
+            for terrain_type in requirements['tile_type']:
+                allowed |= self.terrain.get(terrain_type, 0)
+            mask &= allowed
+        for feature in requirements.get('features', []):
+            mask &= self.features.get(feature, 0)
+        return mask
+
+    def closed_neighbourhood(self, t: int) -> int:
+        """Mask of tile number `t` and its neighbours."""
+        return self.topology.closed_mask(t)
+
+    def match_count(self, pos: Position, mask: int) -> int:
+        """How many of the tile and its neighbours are in `mask`."""
+        return popcount(self.closed_neighbourhood(self.bit_index[pos]) & mask)
+
+    def to_array(self, mask: int) -> np.ndarray:
+        """`mask` as a (tiles,) bool array."""
+        n = len(self.positions)
+        raw = np.frombuffer(mask.to_bytes((n + 7) // 8, "little"), dtype=np.uint8)
+        return np.unpackbits(raw, bitorder="little")[:n].astype(bool)
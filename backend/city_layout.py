@@ -1,20 +1,46 @@
-import math
-from typing import Dict, List, Optional, Tuple
+import copy
+import hashlib
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
-from pathlib import Path
-import json
+import numpy as np
+from backend.bitboard import Bitboard
+from backend.adjacency_rules import AdjacencyProgram
+from backend.game_data import GameData, get_game_data
+from backend.hex_topology import HexTopology, get_topology
+from backend.tile_store import TileStore
+from backend.yield_vector import YIELD_ORDER, BuildingYields, YieldVector
+
+# Zobrist keys per (ring, index, building, copy), derived from a hash of the
+# tuple so every process agrees on them without sharing a random table
+_ZOBRIST_KEYS: Dict[Tuple[int, int, str, int], int] = {}
+
+def zobrist_key(ring: int, index: int, building: str, copy: int = 0) -> int:
+    """
+    64-bit Zobrist key for one building placed on one tile. `copy` counts
+    the same building already on that tile, so a second copy does not XOR
+    the first one away.
+    """
+    key = (ring, index, building, copy)
+    value = _ZOBRIST_KEYS.get(key)
+    if value is None:
+        digest = hashlib.blake2b(f"{ring},{index},{building},{copy}".encode(), digest_size=8).digest()
+        value = _ZOBRIST_KEYS[key] = int.from_bytes(digest, "little")
+    return value
 
 class YieldCalculator:
     """
     Handles all yield-related calculations in one place.
     We keep it here so that CityLayout can call it without circular imports.
     """
-    YIELD_TYPES = {"food", "production", "gold", "science", "culture", "happiness", "influence"}
+    YIELD_TYPES = set(YIELD_ORDER)
+    # Fixed ordering of YIELD_TYPES for vectors and array-backed tables
+    YIELD_ORDER = YIELD_ORDER
 
     @staticmethod
     def create_empty_yields() -> Dict[str, float]:
-        """Create a dict with all yields set to 0."""
-        return {y: 0.0 for y in YieldCalculator.YIELD_TYPES}
+        """Create a dict with all yields set to 0, in YIELD_ORDER."""
+        return dict.fromkeys(YIELD_ORDER, 0.0)
 
     @staticmethod
     def combine_yields(base: Dict[str, float], modifier: Dict[str, float]) -> Dict[str, float]:
@@ -33,114 +59,174 @@ class Position:
     ring: int
     index: int
 
-@dataclass
 class Tile:
-    """Represents a single hex tile in the city."""
-    position: Position
-    terrain_type: str
-    features: List[str]
-    has_fresh_water: bool
-    buildings: List[str] = None
+    """
+    Represents a single hex tile in the city: a lightweight read-only view
+    of one row of the layout's TileStore. Change tiles through CityLayout.
+    """
+    __slots__ = ("_store", "_t", "_pos")
+
+    def __init__(self, store: TileStore, t: int, pos: Tuple[int, int]):
+        self._store = store
+        self._t = t
+        self._pos = pos
+
+    @property
+    def position(self) -> Position:
+        return Position(*self._pos)
+
+    @property
+    def terrain_type(self) -> str:
+        return self._store.terrain_name(self._t)
+
+    @property
+    def features(self) -> List[str]:
+        return self._store.feature_names(self._t)
+
+    @property
+    def has_fresh_water(self) -> bool:
+        return self._store.has_fresh_water(self._t)
+
+    @property
+    def buildings(self) -> List[str]:
+        return self._store.building_names(self._t)
+
+    def __repr__(self):
+        return (f"Tile(position={self.position}, terrain_type={self.terrain_type!r}, "
+                f"features={self.features}, has_fresh_water={self.has_fresh_water}, "
+                f"buildings={self.buildings})")
 
-    def __post_init__(self):
-        self.buildings = self.buildings or []
+class TileMap(Mapping):
+    """(ring, index) -> Tile view over a TileStore, in tile order."""
+
+    def __init__(self, store: TileStore, topology: HexTopology):
+        self._store = store
+        self._topology = topology
+
+    def __getitem__(self, pos) -> Tile:
+        return Tile(self._store, self._topology.index[pos], pos)
+
+    def __contains__(self, pos) -> bool:
+        return pos in self._topology.index
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return iter(self._topology.positions)
+
+    def __len__(self) -> int:
+        return len(self._topology.positions)
 
 class CityLayout:
     """
     Represents the entire city layout with all tiles, building data, etc.
-    We define adjacency using a geometry-based approach:
-      - ring=0..3
-      - ring 1 => 6 tiles -> each tile angle = i*(360/6)
-      - ring 2 => 12 tiles -> each tile angle = i*(360/12)
-      - ring 3 => 18 tiles -> angle = i*(360/18)
-    Then two tiles are adjacent if distance between centers < THRESHOLD.
+    Tiles are addressed as (ring, index):
+      - ring=0..radius (3 for a single city)
+      - ring n => 6n tiles, so ring 1 => 6 tiles, ring 2 => 12, ring 3 => 18
+    Adjacency comes from the shared cube-coordinate HexTopology, so a
+    ring tile touches 6 others and nothing is recomputed per layout.
+    Larger radii model a whole region of several settlements on one board.
     """
 
-    N_TILES = {0: 1, 1: 6, 2: 12, 3: 18}
-    RING_RADIUS = {0: 0.0, 1: 1.0, 2: 2.0, 3: 3.0}
-    THRESHOLD = 1.2  # distance cutoff for adjacency
-
-    def __init__(self):
-        self.tiles: Dict[Tuple[int, int], Tile] = {}
-        self._initialize_grid()
-        self._load_game_data()
-
-        # Precompute adjacency for all tiles
-        self._adjacency_map: Dict[Tuple[int,int], List[Tuple[int,int]]] = {}
-        self._build_adjacency_map()
-
-    def _load_game_data(self):
-        try:
-            data_path = Path(__file__).parent / 'rules' / 'data'
-
-            with open(data_path / 'buildings.json', 'r') as f:
-                self.building_data = json.load(f)
-
-            with open(data_path / 'terrain.json', 'r') as f:
-                self.terrain_data = json.load(f)
-
-            with open(data_path / 'wonders.json', 'r') as f:
-                self.wonder_data = json.load(f)
-
-        except Exception as e:
-            print(f"Warning: Could not load game data: {e}")
-            self.building_data = {}
-            self.terrain_data = {}
-            self.wonder_data = {}
-
-    def _initialize_grid(self):
-        """Create the 37 tiles (center + 3 rings)."""
-        for r in range(4):
-            for i in range(self.N_TILES[r]):
-                self.tiles[(r, i)] = Tile(
-                    position=Position(r, i),
-                    terrain_type="",
-                    features=[],
-                    has_fresh_water=False
-                )
-
-    def _build_adjacency_map(self):
+    DEFAULT_RADIUS = 3
+
+    def __init__(
+        self,
+        game_data: Optional[GameData] = None,
+        radius: int = DEFAULT_RADIUS,
+        reserved: Iterable[Tuple[int, int]] = ((0, 0),)
+    ):
+        # XOR of zobrist_key() over every placed building; maintained by
+        # add_building/remove_building so equal placements hash equally
+        self.zobrist_hash: int = 0
+        # Shared read-only rules; defaults to the process-wide copy
+        self.game_data: GameData = game_data if game_data is not None else get_game_data()
+        self.radius = radius
+        self.topology: HexTopology = get_topology(radius)
+        # Terrain, features and buildings of every tile, as flat arrays
+        self.store = TileStore(len(self.topology.positions))
+        self.tiles: Mapping[Tuple[int, int], Tile] = TileMap(self.store, self.topology)
+
+        # Bit masks for terrain, features, occupancy and neighbourhoods; kept
+        # in sync by set_tile_terrain and the building add/remove methods
+        self.bitboard = Bitboard(self.topology, self.game_data.blocked_terrain)
+        # City centers hold the palace, which fills both of their slots. The
+        # default is a single city centered on (0,0); region boards name
+        # their cities' centers (or none)
+        for pos in reserved:
+            if not self.topology.contains(tuple(pos)):
+                raise ValueError(f"Reserved tile off the grid: {pos}")
+            self.bitboard.reserved |= 1 << self.topology.index[tuple(pos)]
+
+        # Yield cache: (tile, building) -> (tile version, yields). A tile's
+        # version changes whenever anything its yields read changes: its own
+        # buildings, or the terrain of it or a neighbour. Versions come from
+        # a layout-wide clock, so a number is never reused for other contents.
+        self._versions: List[int] = [0] * len(self.topology.positions)
+        self._clock = 0
+        self._yield_cache: Dict[Tuple[int, str], Tuple[int, BuildingYields]] = {}
+
+        # Undo trail for place(): per placement, (tile, slot, zobrist_hash,
+        # occupied, full, version) as they were before it
+        self._trail: List[Tuple[int, int, int, int, int, int]] = []
+
+    @property
+    def building_data(self) -> Dict[str, Dict]:
+        return self.game_data.buildings
+
+    @property
+    def terrain_data(self) -> Dict:
+        return self.game_data.terrain
+
+    @property
+    def wonder_data(self) -> Dict:
+        return self.game_data.wonders
+
+    @property
+    def adjacency_programs(self) -> Dict[str, AdjacencyProgram]:
+        return self.game_data.adjacency_programs
+
+    def __getstate__(self):
+        # The process-wide rules are not copied into pickles (e.g. for worker
+        # processes); the receiving process attaches its own
+        state = self.__dict__.copy()
+        if state["game_data"] is get_game_data():
+            state["game_data"] = None
+        state["_yield_cache"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.game_data is None:
+            self.game_data = get_game_data()
+
+    def clone(self) -> "CityLayout":
+        """
+        Independent copy of this layout (tiles, buildings, hash). The tile
+        data is one buffer copy; rules and topology are shared.
         """
-        Compute adjacency for every tile by geometry:
-          - Each tile center is ( ring_radius[r] * cos(angle), ring_radius[r] * sin(angle) )
-          - angle = i * (360 / N_TILES[r])
-          - Two tiles are neighbors if dist < THRESHOLD
+        twin = copy.copy(self)
+        twin.store = self.store.copy()
+        twin.tiles = TileMap(twin.store, self.topology)
+        twin.bitboard = self.bitboard.copy()
+        twin._trail = list(self._trail)
+        twin._versions = list(self._versions)
+        twin._yield_cache = dict(self._yield_cache)
+        return twin
+
+    def terrain_signature(self) -> Tuple:
         """
-        # Gather centers
-        centers: Dict[Tuple[int,int], Tuple[float,float]] = {}
-        for r in range(4):
-            n = self.N_TILES[r]
-            for i in range(n):
-                angle_deg = (360.0 / n) * i
-                angle_rad = math.radians(angle_deg)
-                radius = self.RING_RADIUS[r]
-                x = radius * math.cos(angle_rad)
-                y = radius * math.sin(angle_rad)
-                centers[(r, i)] = (x, y)
-
-        # Build adjacency by distance
-        for r in range(4):
-            for i in range(self.N_TILES[r]):
-                pos1 = (r, i)
-                c1 = centers[pos1]
-                adj_list = []
-                for rr in range(4):
-                    for ii in range(self.N_TILES[rr]):
-                        pos2 = (rr, ii)
-                        if pos2 == pos1:
-                            continue
-                        c2 = centers[pos2]
-                        dist = math.hypot(c2[0] - c1[0], c2[1] - c1[1])
-                        if dist < self.THRESHOLD:
-                            adj_list.append(pos2)
-                self._adjacency_map[pos1] = adj_list
+        Hashable snapshot of everything static yields depend on: terrain,
+        features and fresh water per tile, and the reserved tiles. Placed
+        buildings are not included. Built from interned codes, so only
+        compare signatures within one process.
+        """
+        return (self.radius, self.bitboard.reserved, self.store.static_bytes())
 
     def get_tile(self, ring: int, index: int) -> Optional[Tile]:
         return self.tiles.get((ring, index))
 
     def get_adjacent_positions(self, ring: int, index: int) -> List[Tuple[int,int]]:
-        """Return the adjacency from our precomputed map."""
-        return self._adjacency_map.get((ring, index), [])
+        """Return the adjacency from the shared topology."""
+        return list(self.topology.neighbours((ring, index)))
 
     def get_adjacent_tiles(self, ring: int, index: int) -> List[Tile]:
         """Return the actual Tile objects for adjacent positions."""
@@ -150,109 +236,177 @@ class CityLayout:
     def set_tile_terrain(self, ring: int, index: int,
                          terrain_type: str, features: List[str],
                          has_fresh_water: bool):
-        if (ring, index) in self.tiles:
-            t = self.tiles[(ring, index)]
-            t.terrain_type = terrain_type
-            t.features = features
-            t.has_fresh_water = has_fresh_water
+        t = self.topology.index.get((ring, index))
+        if t is not None:
+            self._trail.clear()
+            self.store.set_terrain(t, terrain_type, features, has_fresh_water)
+            self.bitboard.set_terrain((ring, index), terrain_type, features, has_fresh_water)
+            # Adjacency reads the closed neighbourhood, so neighbours change too
+            for k in self.topology.closed_neighbourhood(t):
+                self._touch(k)
+
+    def _touch(self, t: int):
+        """Give tile `t` a fresh version, invalidating its cached yields."""
+        self._clock += 1
+        self._versions[t] = self._clock
+
+    def buildings_at(self, ring: int, index: int) -> List[str]:
+        """Buildings on (ring, index), in the order they were added."""
+        t = self.topology.index.get((ring, index))
+        return [] if t is None else self.store.building_names(t)
 
     def is_valid_building_location(self, ring: int, index: int, building: str) -> bool:
-        if building not in self.building_data:
+        t = self.bitboard.bit_index.get((ring, index))
+        if t is None:
             return False
-        tile = self.get_tile(ring, index)
-        if not tile:
+        if self.bitboard.full >> t & 1:
             return False
-        if not tile.terrain_type:
+        return self.meets_placement_requirements(ring, index, building)
+
+    def meets_placement_requirements(self, ring: int, index: int, building: str) -> bool:
+        """
+        Terrain and feature checks for `building` at (ring, index), ignoring
+        how many buildings the tile already holds. These only change when the
+        terrain does, so they can be precomputed per layout.
+        """
+        if building not in self.building_data:
             return False
-        if len(tile.buildings) >= 2:
+        t = self.bitboard.bit_index.get((ring, index))
+        if t is None:
             return False
 
-        binfo = self.building_data[building]
-        reqs = binfo.get('placement_requirements', {})
-
-        # tile_type requirement
-        if 'tile_type' in reqs:
-            if tile.terrain_type not in reqs['tile_type']:
-                return False
-
-        # features requirement
-        if 'features' in reqs:
-            req_feats = set(reqs['features'])
-            tile_feats = set(tile.features)
-            if not req_feats.issubset(tile_feats):
-                return False
-
-        return True
+        # Terrain set, tile_type and features requirements in one mask
+        reqs = self.building_data[building].get('placement_requirements', {})
+        return bool(self.bitboard.placement_mask(reqs) >> t & 1)
 
     def add_building(self, ring: int, index: int, building: str) -> bool:
         if not self.is_valid_building_location(ring, index, building):
             return False
-        self.tiles[(ring, index)].buildings.append(building)
+        self._attach_building(ring, index, building)
         return True
 
-    def _calculate_adjacency_yields(self, ring: int, index: int, building_info: Dict) -> Dict[str, float]:
-        result = YieldCalculator.create_empty_yields()
-        tile = self.get_tile(ring, index)
-        if not tile:
-            return result
+    def _attach_building(self, ring: int, index: int, building: str):
+        """Append without validation, for search code that already checked it."""
+        # Untracked edits invalidate the undo trail
+        self._trail.clear()
+        t = self.topology.index[(ring, index)]
+        copies, count = self.store.add_building(t, building)
+        self.zobrist_hash ^= zobrist_key(ring, index, building, copies)
+        self.bitboard.set_occupancy((ring, index), count)
+        # Quarter bonuses only reach the building's own tile
+        self._touch(t)
+
+    def remove_building(self, ring: int, index: int, building: str) -> bool:
+        t = self.topology.index.get((ring, index))
+        removed = None if t is None else self.store.remove_building(t, building)
+        if removed is None:
+            return False
+        self._trail.clear()
+        copies, count = removed
+        self.zobrist_hash ^= zobrist_key(ring, index, building, copies)
+        self.bitboard.set_occupancy((ring, index), count)
+        self._touch(t)
+        return True
 
-        neighbors = self.get_adjacent_tiles(ring, index)
-        for rule in building_info.get('adjacency_rules', []):
-            sources = rule.get('sources', [])
-            bonus_yields = rule.get('bonus_yields', {})
-            match_count = 0
-
-            # Check if current tile matches any source
-            for src in sources:
-                if src == "coastal_tile" and tile.terrain_type in ["coast","navigable_river","coastal_lake"]:
-                    match_count += 1
-                    break
-                elif src == tile.terrain_type:
-                    match_count += 1
-                    break
-                elif src in tile.features:
-                    match_count += 1
-                    break
-
-            # Check neighbors
-            for nbr in neighbors:
-                for src in sources:
-                    if src == "coastal_tile" and nbr.terrain_type in ["coast","navigable_river","coastal_lake"]:
-                        match_count += 1
-                        break
-                    elif src == nbr.terrain_type:
-                        match_count += 1
-                        break
-                    elif src in nbr.features:
-                        match_count += 1
-                        break
-
-            # Apply bonus for each match
-            for yld_type, val in bonus_yields.items():
-                result[yld_type] += val * match_count
+    def place(self, ring: int, index: int, building: str, validate: bool = True) -> bool:
+        """
+        Add `building` at (ring, index) so that `undo()` can take it back.
+        Placements are undone last-in first-out; add_building,
+        remove_building and terrain edits are not recorded and discard the
+        trail. Pass
+        validate=False only if the location was already checked.
+        """
+        if validate and not self.is_valid_building_location(ring, index, building):
+            return False
+        t = self.topology.index[(ring, index)]
+        board = self.bitboard
+        hash_before, occupied, full = self.zobrist_hash, board.occupied, board.full
+        copies, count = self.store.add_building(t, building)
+        self._trail.append((t, count - 1, hash_before, occupied, full, self._versions[t]))
+        self.zobrist_hash = hash_before ^ zobrist_key(ring, index, building, copies)
+        board.set_occupancy((ring, index), count)
+        self._touch(t)
+        return True
 
-        return result
+    def undo(self) -> bool:
+        """
+        Take back the most recent place() in O(1): its slot, the hash, the
+        occupancy masks and the tile version are restored from the trail, so
+        yields cached for the tile before the placement (and not replaced
+        since) are valid again. False if there is nothing to undo.
+        """
+        if not self._trail:
+            return False
+        t, slot, self.zobrist_hash, occupied, full, self._versions[t] = self._trail.pop()
+        self.store.clear_slot(t, slot)
+        self.bitboard.occupied = occupied
+        self.bitboard.full = full
+        return True
 
-    def _calculate_quarter_yields(self, ring: int, index: int, building: str, building_info: Dict) -> Dict[str, float]:
-        result = YieldCalculator.create_empty_yields()
-        tile = self.get_tile(ring, index)
-        if not tile:
+    def savepoint(self) -> int:
+        """Marker for rollback(): the current depth of the undo trail."""
+        return len(self._trail)
+
+    def rollback(self, savepoint: int):
+        """Undo every place() made since `savepoint`."""
+        while len(self._trail) > savepoint:
+            self.undo()
+
+    def adjacency_vector(self, ring: int, index: int, building: str) -> List[float]:
+        """Adjacency yields of `building` at (ring, index) along YIELD_ORDER."""
+        t = self.bitboard.bit_index.get((ring, index))
+        program = self.adjacency_programs.get(building)
+        if t is None or program is None:
+            return [0.0] * len(YIELD_ORDER)
+        # The tile itself and each neighbour count once per rule if they
+        # match any of its sources
+        return program.evaluate(self.bitboard, t)
+
+    def adjacency_array(self, building: str) -> np.ndarray:
+        """(tiles, yields) adjacency yields of `building` on every tile, in tile order."""
+        program = self.adjacency_programs.get(building)
+        if program is None:
+            return np.zeros((len(self.tiles), len(YIELD_ORDER)))
+        return program.evaluate_all(self.bitboard)
+
+    def _calculate_adjacency_yields(self, ring: int, index: int, building: str) -> YieldVector:
+        return YieldVector(self.adjacency_vector(ring, index, building))
+
+    def _calculate_quarter_yields(self, ring: int, index: int, building: str, building_info: Dict) -> YieldVector:
+        result = YieldVector()
+        if (ring, index) not in self.topology.index:
             return result
 
-        # If there's at least one building, add synergy
-        for b in tile.buildings:
-            if b == building:
-                continue
+        # A quarter only forms with a differently named partner: then the
+        # building gets its own bonus plus every partner's
+        partners = [b for b in self.buildings_at(ring, index) if b != building]
+        if not partners:
+            return result
+        for b in partners:
             b_info = self.building_data.get(b, {})
-            for yld, v in b_info.get('quarter_bonuses', {}).items():
-                result[yld] += v
-
-        for yld, v in building_info.get('quarter_bonuses', {}).items():
-            result[yld] += v
+            result += YieldVector.from_dict(b_info.get('quarter_bonuses', {}))
 
+        result += YieldVector.from_dict(building_info.get('quarter_bonuses', {}))
         return result
 
+    def building_yield_vectors(self, ring: int, index: int, building: str) -> Optional[BuildingYields]:
+        """
+        Base, adjacency, quarter and total yields of `building` at (ring,
+        index) as vectors, or None for an unknown building or tile. Results
+        are cached per tile and building until the tile's version changes,
+        so treat them as read-only.
+        """
+        t = self.topology.index.get((ring, index))
+        if t is None or building not in self.building_data:
+            return None
+        cached = self._yield_cache.get((t, building))
+        if cached is None or cached[0] != self._versions[t]:
+            cached = (self._versions[t], self._compute_building_yields(ring, index, building))
+            self._yield_cache[(t, building)] = cached
+        return cached[1]
+
     def calculate_building_yields(self, ring: int, index: int, building: str) -> Dict[str, Dict[str, float]]:
+        """Yield breakdown of `building` at (ring, index) as fresh dicts keyed by yield type."""
         if building not in self.building_data:
             return {
                 "base_yields": {},
@@ -260,35 +414,22 @@ class CityLayout:
                 "quarter_yields": {},
                 "total_yields": {}
             }
+        vectors = self.building_yield_vectors(ring, index, building)
+        if vectors is None:
+            # Off the grid: no adjacency or quarter partners
+            vectors = self._compute_building_yields(ring, index, building)
+        return vectors.to_dict()
 
-        tile = self.get_tile(ring, index)
+    def _compute_building_yields(self, ring: int, index: int, building: str) -> BuildingYields:
         building_info = self.building_data[building]
 
-        # 1) tile yields = 0 for an "urban" building
-        tile_yields = YieldCalculator.create_empty_yields()
-
-        # 2) base building yields
-        base_yields = building_info.get("yields", {})
-
-        # 3) adjacency yields
-        adjacency = self._calculate_adjacency_yields(ring, index, building_info)
-
-        # 4) quarter yields
+        # Urban buildings get no tile yields, so the total starts from the
+        # base building yields
+        base = YieldVector.from_dict(building_info.get("yields", {}))
+        adjacency = self._calculate_adjacency_yields(ring, index, building)
         quarter = self._calculate_quarter_yields(ring, index, building, building_info)
 
-        total = YieldCalculator.create_empty_yields()
-        for k, v in tile_yields.items():
-            total[k] += v
-        for k, v in base_yields.items():
-            total[k] += v
-        for k, v in adjacency.items():
-            total[k] += v
-        for k, v in quarter.items():
-            total[k] += v
-
-        return {
-            "base_yields": base_yields,
-            "adjacency_yields": adjacency,
-            "quarter_yields": quarter,
-            "total_yields": total
-        }
+        total = base.copy()
+        total += adjacency
+        total += quarter
+        return BuildingYields(base=base, adjacency=adjacency, quarter=quarter, total=total)
@@ -0,0 +1,266 @@
+# game_data.py
+
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from threading import Lock
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Mapping, Optional
+from backend import adjacency_rules
+from backend.adjacency_rules import AdjacencyProgram, compile_adjacency_rules
+from backend.yield_vector import YIELD_ORDER
+
+DATA_DIR = Path(__file__).parent / 'rules' / 'data'
+# Attribute name -> rule file
+DATA_FILES = {
+    "buildings": "buildings.json",
+    "terrain": "terrain.json",
+    "wonders": "wonders.json",
+}
+
+# Compiled GameData pickles, one per source hash. Set GAME_DATA_CACHE_DIR to
+# move them; the default is the user's cache directory, since the package
+# itself may be installed read-only.
+CACHE_DIR = Path(
+    os.environ.get('GAME_DATA_CACHE_DIR')
+    or Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'hex_optimizer'
+)
+# Modules whose code decides what a compiled pickle contains
+COMPILER_MODULES = (adjacency_rules.__file__, __file__)
+
+class FrozenDict(dict):
+    """A dict that refuses changes. Still a dict, so json.dumps and .get() work."""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("game data is read-only")
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+def freeze(value: Any) -> Any:
+    """Deep copy of parsed JSON with dicts frozen and lists turned into tuples."""
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+def _check_yields(name: str, field: str, yields: Any, yield_types):
+    if not isinstance(yields, dict):
+        raise ValueError(f"{name}: '{field}' must be an object")
+    for yld, value in yields.items():
+        if yld not in yield_types:
+            raise ValueError(f"{name}: unknown yield type '{yld}' in '{field}'")
+        if not isinstance(value, (int, float)):
+            raise ValueError(f"{name}: '{field}.{yld}' must be a number")
+
+def validate_buildings(buildings: Any, yield_types) -> None:
+    """Raise ValueError if buildings.json does not have the shape the scorer relies on."""
+    if not isinstance(buildings, dict):
+        raise ValueError("buildings must be an object keyed by building name")
+    for name, info in buildings.items():
+        if not isinstance(info, dict):
+            raise ValueError(f"{name}: building entry must be an object")
+        _check_yields(name, 'yields', info.get('yields', {}), yield_types)
+        _check_yields(name, 'quarter_bonuses', info.get('quarter_bonuses', {}), yield_types)
+
+        reqs = info.get('placement_requirements', {})
+        if not isinstance(reqs, dict):
+            raise ValueError(f"{name}: 'placement_requirements' must be an object")
+        for key in ('tile_type', 'features'):
+            if not isinstance(reqs.get(key, []), (list, tuple)):
+                raise ValueError(f"{name}: 'placement_requirements.{key}' must be a list")
+
+        rules = info.get('adjacency_rules', [])
+        if not isinstance(rules, (list, tuple)):
+            raise ValueError(f"{name}: 'adjacency_rules' must be a list")
+        for rule in rules:
+            if not isinstance(rule, dict) or not isinstance(rule.get('sources', []), (list, tuple)):
+                raise ValueError(f"{name}: adjacency rule needs a 'sources' list")
+            _check_yields(name, 'bonus_yields', rule.get('bonus_yields', {}), yield_types)
+
+class GameData:
+    """
+    Validated, read-only view of the rule files plus everything compiled
+    from them (adjacency programs, the terrain no building may use). Loaded
+    once per process through
+    `get_game_data()` and shared by every CityLayout, so building a layout
+    costs no file I/O or parsing.
+
+    `version` is a hash of the source data; caches of anything derived from
+    the rules key on it. Pickles carry the compiled state, so unpickling
+    (worker processes, the on-disk cache) skips validation and compiling.
+    """
+
+    def __init__(
+        self,
+        buildings: Dict[str, Dict],
+        terrain: Optional[Dict] = None,
+        wonders: Optional[Dict] = None,
+        version: Optional[str] = None
+    ):
+        # Imported here: city_layout imports this module
+        from backend.city_layout import YieldCalculator
+
+        terrain = terrain or {}
+        wonders = wonders or {}
+        validate_buildings(buildings, YieldCalculator.YIELD_TYPES)
+        if version is None:
+            source = json.dumps([buildings, terrain, wonders], sort_keys=True)
+            version = hashlib.sha256(source.encode()).hexdigest()
+
+        set_attr = super().__setattr__
+        set_attr("buildings", freeze(buildings))
+        set_attr("terrain", freeze(terrain))
+        set_attr("wonders", freeze(wonders))
+        set_attr("version", version)
+        programs = compile_adjacency_rules(self.buildings, YieldCalculator.YIELD_ORDER)
+        set_attr("adjacency_programs", MappingProxyType(programs))
+        # Land that is not buildable (mountains); water tiles are left to the
+        # buildings' own tile_type requirements
+        set_attr("blocked_terrain", frozenset(
+            name for name, info in self.terrain.items()
+            if not info.get('is_buildable', True) and not info.get('is_water', False)
+        ))
+
+    buildings: Mapping[str, Mapping]
+    terrain: Mapping[str, Any]
+    wonders: Mapping[str, Any]
+    version: str
+    adjacency_programs: Mapping[str, AdjacencyProgram]
+    blocked_terrain: FrozenSet[str]
+
+    def __setattr__(self, name, value):
+        raise AttributeError("GameData is read-only")
+
+    def __reduce__(self):
+        state = {k: v for k, v in self.__dict__.items() if k != "adjacency_programs"}
+        state["adjacency_programs"] = dict(self.adjacency_programs)
+        return (_restore_game_data, (state,))
+
+    @classmethod
+    def from_directory(
+        cls,
+        data_dir: Path = DATA_DIR,
+        cache_dir: Optional[Path] = CACHE_DIR
+    ) -> "GameData":
+        """
+        Load the rule files from `data_dir`. A file that cannot be read is
+        reported and treated as empty; data that does not validate raises.
+
+        With a `cache_dir`, the compiled result is stored there as a pickle
+        named after the hash of the JSON sources, and later loads of the same
+        sources read that pickle instead of parsing and compiling. Editing
+        any rule file, the compiler or YIELD_ORDER changes the pickle's name
+        (see `compiler_version`), so the cache rebuilds by itself.
+        """
+        raw_files: Dict[str, bytes] = {}
+        digest = hashlib.sha256()
+        for attr, filename in DATA_FILES.items():
+            try:
+                raw_files[attr] = (Path(data_dir) / filename).read_bytes()
+            except Exception as e:
+                print(f"Warning: Could not load game data: {e}")
+                raw_files[attr] = None
+            digest.update(filename.encode() + b"\0" + (raw_files[attr] or b"") + b"\0")
+        version = digest.hexdigest()
+
+        if cache_dir is not None:
+            cached = _read_cache(Path(cache_dir), version)
+            if cached is not None:
+                return cached
+
+        parsed: Dict[str, Dict] = {}
+        complete = all(raw is not None for raw in raw_files.values())
+        for attr, raw in raw_files.items():
+            try:
+                parsed[attr] = json.loads(raw) if raw is not None else {}
+            except Exception as e:
+                print(f"Warning: Could not load game data: {e}")
+                parsed[attr] = {}
+                complete = False
+        data = cls(version=version, **parsed)
+
+        # Only cache complete data, so a broken file keeps warning until fixed
+        if cache_dir is not None and complete:
+            _write_cache(Path(cache_dir), data)
+        return data
+
+def _restore_game_data(state: Dict[str, Any]) -> GameData:
+    data = GameData.__new__(GameData)
+    for name, value in state.items():
+        if name == "adjacency_programs":
+            value = MappingProxyType(value)
+        object.__setattr__(data, name, value)
+    return data
+
+_COMPILER_VERSION: Optional[str] = None
+
+def compiler_version() -> str:
+    """
+    Hash of everything besides the JSON that shapes the compiled data:
+    YIELD_ORDER (the adjacency programs' vector layout) and the code of the
+    modules that build and pickle GameData. Changing any of them retires
+    existing pickles without a manual version bump.
+    """
+    global _COMPILER_VERSION
+    if _COMPILER_VERSION is None:
+        digest = hashlib.sha256(",".join(YIELD_ORDER).encode() + b"\0")
+        for module in COMPILER_MODULES:
+            try:
+                digest.update(Path(module).read_bytes())
+            except OSError:
+                # Unreadable module file: the key still covers YIELD_ORDER
+                digest.update(module.encode())
+        _COMPILER_VERSION = digest.hexdigest()
+    return _COMPILER_VERSION
+
+def _cache_path(cache_dir: Path, version: str) -> Path:
+    return cache_dir / f"game_data-{compiler_version()[:16]}-{version[:32]}.pickle"
+
+def _read_cache(cache_dir: Path, version: str) -> Optional[GameData]:
+    """The cached GameData for `version`, or None if missing or unreadable."""
+    try:
+        with open(_cache_path(cache_dir, version), 'rb') as f:
+            data = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(data, GameData) or data.version != version:
+        return None
+    return data
+
+def _write_cache(cache_dir: Path, data: GameData):
+    """Store `data` atomically and drop pickles of older sources. Failures are ignored."""
+    path = _cache_path(cache_dir, data.version)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(tmp, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        for stale in cache_dir.glob("game_data-*.pickle"):
+            if stale != path:
+                stale.unlink()
+    except OSError:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+
+_GAME_DATA: Optional[GameData] = None
+_GAME_DATA_LOCK = Lock()
+
+def get_game_data() -> GameData:
+    """The process-wide GameData, loaded from the rule files on first use."""
+    global _GAME_DATA
+    if _GAME_DATA is None:
+        with _GAME_DATA_LOCK:
+            if _GAME_DATA is None:
+                _GAME_DATA = GameData.from_directory()
+    return _GAME_DATA
@@ -0,0 +1,177 @@
+# hex_topology.py
+
+from functools import cached_property, lru_cache
+from typing import Dict, List, Tuple
+import numpy as np
+
+Position = Tuple[int, int]   # (ring, index)
+Cube = Tuple[int, int, int]  # (q, r, s) with q + r + s == 0
+
+# Unit steps to the six neighbours, in walking order around a ring: walking
+# side k of ring n from its first tile means taking n steps along
+# CUBE_DIRECTIONS[k]
+CUBE_DIRECTIONS: Tuple[Cube, ...] = (
+    (0, -1, 1), (-1, 0, 1), (-1, 1, 0), (0, 1, -1), (1, 0, -1), (1, -1, 0),
+)
+
+def ring_size(ring: int) -> int:
+    """Tiles in ring `ring` (1 for the center)."""
+    return 1 if ring == 0 else 6 * ring
+
+def ring_to_cube(ring: int, index: int) -> Cube:
+    """
+    Cube coordinates of tile (ring, index). Index 0 of ring n is (n, 0, -n)
+    and indexes run around the ring, n tiles per side.
+    """
+    if ring == 0:
+        return (0, 0, 0)
+    side, step = divmod(index, ring)
+    # First tile of this side, then `step` tiles along it
+    q, r, s = ring, 0, -ring
+    for k in range(side):
+        dq, dr, ds = CUBE_DIRECTIONS[k]
+        q, r, s = q + dq * ring, r + dr * ring, s + ds * ring
+    dq, dr, ds = CUBE_DIRECTIONS[side]
+    return (q + dq * step, r + dr * step, s + ds * step)
+
+def cube_distance(a: Cube, b: Cube) -> int:
+    """Hex steps between two cube coordinates."""
+    return max(abs(a[0] - b[0]), abs(a[1] - b[1]), abs(a[2] - b[2]))
+
+def cube_to_ring(cube: Cube) -> Position:
+    """Inverse of ring_to_cube."""
+    ring = cube_distance(cube, (0, 0, 0))
+    if ring == 0:
+        return (0, 0)
+    # Find the side whose walk passes through `cube`
+    for side, (dq, dr, ds) in enumerate(CUBE_DIRECTIONS):
+        q, r, s = ring_to_cube(ring, side * ring)
+        step = cube_distance((q, r, s), cube)
+        if step < ring and (q + dq * step, r + dr * step, s + ds * step) == cube:
+            return (ring, side * ring + step)
+    raise ValueError(f"Not a cube coordinate: {cube}")
+
+def cube_neighbours(cube: Cube) -> List[Cube]:
+    q, r, s = cube
+    return [(q + dq, r + dr, s + ds) for dq, dr, ds in CUBE_DIRECTIONS]
+
+def cube_transform(cube: Cube, rotation: int, mirror: bool = False) -> Cube:
+    """
+    One of the 12 symmetries of the hex grid around the center: optionally
+    mirror (swap r and s), then rotate by `rotation` steps of 60 degrees.
+    """
+    q, r, s = cube
+    if mirror:
+        r, s = s, r
+    for _ in range(rotation % 6):
+        q, r, s = -r, -s, -q
+    return (q, r, s)
+
+class HexTopology:
+    """
+    Geometry of a hex disk of `radius` rings around a center tile.
+
+    Tiles are numbered ring by ring (the order CityLayout stores them in),
+    and neighbour lists, index arrays and bit masks use that numbering.
+    Everything built up front is O(tiles), so region-sized disks with
+    thousands of tiles are cheap; the all-pairs `distance` matrix is only
+    built if asked for. Instances are immutable; use `get_topology` to
+    share one per radius.
+    """
+
+    def __init__(self, radius: int):
+        if radius < 0:
+            raise ValueError(f"radius must be >= 0, got {radius}")
+        self.radius = radius
+        self.positions: List[Position] = [
+            (ring, index) for ring in range(radius + 1) for index in range(ring_size(ring))
+        ]
+        self.index: Dict[Position, int] = {pos: t for t, pos in enumerate(self.positions)}
+        self.cubes: List[Cube] = [ring_to_cube(*pos) for pos in self.positions]
+        self.cube_index: Dict[Cube, int] = {cube: t for t, cube in enumerate(self.cubes)}
+
+        # Neighbours inside the disk, as positions and as a (tiles, 6) index
+        # array padded with len(positions) (a sentinel slot for gathers)
+        n = len(self.positions)
+        self.adjacency: Dict[Position, Tuple[Position, ...]] = {}
+        self.neighbour_index = np.full((n, 6), n, dtype=np.int64)
+        for t, (pos, cube) in enumerate(zip(self.positions, self.cubes)):
+            inside = [self.cube_index[c] for c in cube_neighbours(cube) if c in self.cube_index]
+            self.adjacency[pos] = tuple(self.positions[k] for k in inside)
+            self.neighbour_index[t, :len(inside)] = inside
+        self.neighbour_index.flags.writeable = False
+
+    def __reduce__(self):
+        # Pickles (e.g. layouts sent to workers) just name the shared instance
+        return (get_topology, (self.radius,))
+
+    @property
+    def n_tiles(self) -> int:
+        return len(self.positions)
+
+    @cached_property
+    def distance(self) -> np.ndarray:
+        """(tiles, tiles) hex distance between every pair of tiles. O(tiles^2), built on first use."""
+        cubes = np.array(self.cubes, dtype=np.int32).reshape(-1, 3)
+        matrix = np.abs(cubes[:, None, :] - cubes[None, :, :]).max(axis=2)
+        matrix.flags.writeable = False
+        return matrix
+
+    @cached_property
+    def symmetries(self) -> Tuple[Tuple[int, ...], ...]:
+        """
+        The 12 rotations and reflections of the disk as tile permutations:
+        symmetries[g][t] is where tile number `t` goes under symmetry `g`.
+        symmetries[0] is the identity.
+        """
+        return tuple(
+            tuple(self.cube_index[cube_transform(cube, rotation, mirror)] for cube in self.cubes)
+            for mirror in (False, True) for rotation in range(6)
+        )
+
+    def contains(self, pos: Position) -> bool:
+        return pos in self.index
+
+    def neighbours(self, pos: Position) -> Tuple[Position, ...]:
+        return self.adjacency.get(pos, ())
+
+    def neighbour_mask(self, t: int) -> int:
+        """Bit mask of the neighbours of tile number `t`."""
+        mask = 0
+        for k in self.neighbour_index[t]:
+            if k < len(self.positions):
+                mask |= 1 << int(k)
+        return mask
+
+    def closed_mask(self, t: int) -> int:
+        """Bit mask of tile number `t` and its neighbours."""
+        return self.neighbour_mask(t) | (1 << t)
+
+    def closed_neighbourhood(self, t: int) -> List[int]:
+        """Tile number `t` and its neighbours' tile numbers."""
+        return [t] + [k for k in self.neighbour_index[t].tolist() if k < len(self.positions)]
+
+    def tile_distance(self, a: Position, b: Position) -> int:
+        """Hex steps between two tiles, without the distance matrix."""
+        return cube_distance(self.cubes[self.index[a]], self.cubes[self.index[b]])
+
+    def ring(self, ring: int) -> List[Position]:
+        """The tiles of one ring, in index order."""
+        return [(ring, index) for index in range(ring_size(ring))] if 0 <= ring <= self.radius else []
+
+    def disk(self, center: Position, radius: int) -> List[Position]:
+        """Tiles of this topology within `radius` steps of `center`, in tile order."""
+        cq, cr, cs = self.cubes[self.index[center]]
+        found = []
+        for dq in range(-radius, radius + 1):
+            for dr in range(max(-radius, -dq - radius), min(radius, -dq + radius) + 1):
+                t = self.cube_index.get((cq + dq, cr + dr, cs - dq - dr))
+                if t is not None:
+                    found.append(t)
+        return [self.positions[t] for t in sorted(found)]
+
+# A few radii are in use at a time; big region disks are not kept forever
+@lru_cache(maxsize=8)
+def get_topology(radius: int = 3) -> HexTopology:
+    """The shared HexTopology for `radius`."""
+    return HexTopology(radius)
@@ -0,0 +1,148 @@
+# jobs.py
+
+import logging
+import math
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from threading import Event, Lock
+from typing import Any, Callable, Dict, Optional
+from backend.optimizer import CityOptimizer, SearchCancelled
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_pending jobs are already waiting or running."""
+
+@dataclass
+class Job:
+    """One optimization submitted to a JobQueue."""
+    id: str
+    optimizer: Optional[CityOptimizer] = field(default=None, repr=False)
+    status: str = QUEUED
+    # Nodes searched (iterations for local search) and the incumbent score so far
+    progress: Dict[str, Any] = field(default_factory=lambda: {"nodes_explored": 0, "best_score": None})
+    result: Any = None
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    _finished_event: Event = field(default_factory=Event, repr=False, compare=False)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job has finished (or `timeout` passes); True if it has."""
+        return self._finished_event.wait(timeout)
+
+    def report(self, optimizer: CityOptimizer):
+        """CityOptimizer.progress_callback for this job's search."""
+        best = optimizer.best_score
+        self.progress = {
+            "nodes_explored": optimizer.nodes_explored,
+            "best_score": best if math.isfinite(best) else None,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+class JobQueue:
+    """
+    Runs optimizations in the background on a bounded thread pool.
+
+    `submit` takes the CityOptimizer a job will search with and a callable
+    that runs the search and returns the job's (JSON-ready) result. The
+    optimizer reports progress into the job at its periodic check-ins, and
+    `cancel` stops a queued job before it starts or a running one at its
+    next check-in. At most `max_pending` jobs wait or run at once; only the
+    `keep_finished` most recent finished jobs are remembered.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 32, keep_finished: int = 256):
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="optimize-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._futures: Dict[str, Future] = {}
+        self._lock = Lock()
+
+    def submit(self, optimizer: CityOptimizer, run: Callable[[], Any]) -> Job:
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job.status not in FINISHED)
+            if active >= self.max_pending:
+                raise QueueFull(f"{active} optimization jobs already queued or running")
+            job = Job(id=uuid.uuid4().hex, optimizer=optimizer)
+            optimizer.progress_callback = job.report
+            self._jobs[job.id] = job
+            self._futures[job.id] = self._executor.submit(self._run, job, run)
+            self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a job; returns it (None if unknown). Finished jobs are left as they are."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == QUEUED:
+                self._futures[job_id].cancel()
+                self._finish(job, CANCELLED)
+            elif job.status == RUNNING:
+                job.optimizer.cancel()
+        return job
+
+    def shutdown(self, wait: bool = True):
+        """Cancel everything still queued or running and stop the pool."""
+        for job_id in list(self._jobs):
+            self.cancel(job_id)
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job: Job, run: Callable[[], Any]):
+        with self._lock:
+            if job.status != QUEUED:
+                return
+            job.status = RUNNING
+
+        status, result, error = DONE, None, None
+        try:
+            result = run()
+        except SearchCancelled:
+            status = CANCELLED
+        except Exception as e:
+            logging.exception(f"Optimization job {job.id} failed")
+            status, error = FAILED, str(e)
+
+        with self._lock:
+            job.result, job.error = result, error
+            self._finish(job, status)
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished = time.time()
+        job.report(job.optimizer)
+        # The layout and search state are not needed any more
+        job.optimizer = None
+        job._finished_event.set()
+        self._futures.pop(job.id, None)
+        self._prune()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
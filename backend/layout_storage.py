@@ -1,14 +1,19 @@
 import json
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 from backend.city_layout import CityLayout
 from backend.terrain_mapping import get_terrain_from_color, get_color_from_terrain
 
+# Outermost ring a layout may use (radius 30 is 2791 tiles). Grids grow to
+# fit the input, so this is what stops a far-away hex from building a huge one
+MAX_RADIUS = 30
+
 class LayoutStorage:
-    def __init__(self, storage_dir: str = "saved_layouts"):
+    def __init__(self, storage_dir: str = "saved_layouts", max_radius: int = MAX_RADIUS):
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(exist_ok=True)
+        self.max_radius = max_radius
         
     def save_layout(self, hex_data: Dict[str, str], name: Optional[str] = None) -> str:
         """
@@ -73,13 +78,27 @@ class LayoutStorage:
                 print(f"Error reading {path}: {e}")
         return sorted(layouts, key=lambda x: x["timestamp"], reverse=True)
     
-    def create_city_layout(self, hex_data: Dict[str, str]) -> CityLayout:
-        """Convert hex data to CityLayout object"""
-        city = CityLayout()
+    def create_city_layout(
+        self,
+        hex_data: Dict[str, str],
+        reserved: List[Tuple[int, int]]
+    ) -> CityLayout:
+        """
+        Convert hex data to CityLayout object. The grid grows past the usual
+        3 rings when the data has tiles further out (region planning), up
+        to `max_radius`; a tile beyond that raises ValueError.
+        `reserved` names the city centers (see CityLayout): [(0, 0)] for a
+        single city, the cities' own centers for a region board.
+        """
+        # Parse position strings "(ring,index)"
+        positions = {pos: tuple(map(int, pos.strip("()").split(","))) for pos in hex_data}
+        radius = max([CityLayout.DEFAULT_RADIUS] + [ring for ring, _ in positions.values()])
+        if radius > self.max_radius:
+            raise ValueError(f"Ring {radius} is beyond the largest supported grid radius ({self.max_radius})")
+        city = CityLayout(radius=radius, reserved=reserved)
         
         for pos, color in hex_data.items():
-            # Parse position string "(ring,index)"
-            ring, index = map(int, pos.strip("()").split(","))
+            ring, index = positions[pos]
             terrain = get_terrain_from_color(color)
             if terrain:
                 # For now, we're not setting features or fresh water
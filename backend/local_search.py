@@ -0,0 +1,210 @@
+# local_search.py
+
+import math
+import random
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from backend.bitboard import iter_bits
+
+if TYPE_CHECKING:
+    from backend.optimizer import CityOptimizer
+
+Position = Tuple[int, int]
+
+class LocalSearch:
+    """
+    Anytime simulated annealing over (building -> tile) assignments.
+
+    Each building in the request is either assigned a tile or skipped.
+    Moves relocate one building (possibly to "skipped") or swap the tiles of
+    two buildings; both keep the 2-buildings-per-tile limit and only use
+    tiles that meet the building's placement requirements (and its tile
+    mask, if the optimizer run has one). Scores come from
+    the optimizer's incremental `_placement_delta`, so a move costs O(1).
+
+    The search always holds the best arrangement found so far, so stopping
+    at any point (the wall-clock budget running out) still gives an answer.
+    """
+
+    CHECK_EVERY = 64  # iterations between clock checks
+    SWAP_PROBABILITY = 0.3
+
+    def __init__(
+        self,
+        optimizer: "CityOptimizer",
+        buildings: List[str],
+        yield_priorities: Dict[str, float],
+        seed: Optional[int] = None
+    ):
+        self.optimizer = optimizer
+        self.city = optimizer.city
+        self.buildings = buildings
+        self.yield_priorities = yield_priorities
+        self.rng = random.Random(seed)
+
+        table = optimizer._table
+        self.candidates: List[List[Position]] = []
+        for building, tile_mask in zip(buildings, optimizer._tile_masks):
+            b = table.building_index.get(building)
+            if b is None:
+                self.candidates.append([])
+            else:
+                allowed = table.valid_masks[b] & tile_mask
+                self.candidates.append([table.positions[t] for t in iter_bits(allowed)])
+        self.candidate_sets = [set(c) for c in self.candidates]
+
+        self.assignment: List[Optional[Position]] = [None] * len(buildings)
+        self.score = 0.0
+        self.iterations = 0
+
+    def run(self, time_budget_ms: float) -> Tuple[float, List[Tuple[str, Position]]]:
+        """
+        Anneal until the budget runs out. Returns (best_score, best_arrangement)
+        with the arrangement in building-list order. The layout is left as it
+        was found, including its place()/undo() trail.
+        """
+        start = time.perf_counter()
+        budget = max(time_budget_ms, 0) / 1000.0
+        # Moves are untracked edits, which discard the layout's undo trail.
+        # Every move is taken back before returning, so the caller's trail
+        # is valid again afterwards and is put back as it was.
+        trail = list(self.city._trail)
+
+        self._greedy_start()
+        best_score = self.score
+        best_assignment = list(self.assignment)
+        reported = None
+
+        movable = [i for i, c in enumerate(self.candidates) if c]
+        t_start = self._initial_temperature()
+        t_end = t_start * 1e-3
+
+        try:
+            while movable:
+                if self.iterations % self.CHECK_EVERY == 0:
+                    elapsed = time.perf_counter() - start
+                    if elapsed >= budget:
+                        break
+                    temperature = t_start * (t_end / t_start) ** (elapsed / budget)
+                    # Progress, incumbents and cancellation go through the optimizer
+                    self.optimizer.nodes_explored = self.iterations
+                    self.optimizer.best_score = best_score
+                    if reported is None or best_score > reported:
+                        reported = best_score
+                        self.optimizer.best_arrangement = self._arrangement(best_assignment)
+                        self.optimizer._new_incumbent()
+                    self.optimizer._check_in()
+                self.iterations += 1
+
+                if self.rng.random() < self.SWAP_PROBABILITY:
+                    delta = self._try_swap(movable, temperature)
+                else:
+                    delta = self._try_relocate(movable, temperature)
+                if delta is None:
+                    continue
+
+                self.score += delta
+                if self.score > best_score:
+                    best_score = self.score
+                    best_assignment = list(self.assignment)
+        finally:
+            # Leave the layout untouched, even when cancelled
+            for i, pos in enumerate(self.assignment):
+                if pos is not None:
+                    self._remove(i)
+            self.city._trail[:] = trail
+
+        return best_score, self._arrangement(best_assignment)
+
+    def _arrangement(self, assignment: List[Optional[Position]]) -> List[Tuple[str, Position]]:
+        """An assignment as (building, position) pairs in building-list order."""
+        return [(self.buildings[i], pos) for i, pos in enumerate(assignment) if pos is not None]
+
+    def _greedy_start(self):
+        """Place each building on its best free tile if that gains anything."""
+        for i, building in enumerate(self.buildings):
+            best_delta, best_pos = 0.0, None
+            for pos in self.candidates[i]:
+                if len(self.city.buildings_at(*pos)) < 2:
+                    delta = self.optimizer._placement_delta(building, pos, self.yield_priorities)
+                    if delta > best_delta:
+                        best_delta, best_pos = delta, pos
+            if best_pos is not None:
+                self.score += self._place(i, best_pos)
+
+    def _initial_temperature(self) -> float:
+        """Start hot enough to accept losing a typical single placement."""
+        deltas = [
+            abs(self.optimizer._placement_delta(self.buildings[i], c[0], self.yield_priorities))
+            for i, c in enumerate(self.candidates) if c
+        ]
+        return max(max(deltas, default=1.0), 1e-3)
+
+    def _accept(self, delta: float, temperature: float) -> bool:
+        if delta >= 0:
+            return True
+        return self.rng.random() < math.exp(delta / temperature)
+
+    def _try_relocate(self, movable: List[int], temperature: float) -> Optional[float]:
+        """Move one building to another tile or skip it. Returns the accepted delta."""
+        i = self.rng.choice(movable)
+        old = self.assignment[i]
+        options = self.candidates[i]
+        # One extra slot for "skip"
+        k = self.rng.randrange(len(options) + 1)
+        new = options[k] if k < len(options) else None
+        if new == old:
+            return None
+        if new is not None and len(self.city.buildings_at(*new)) >= 2:
+            return None
+
+        delta = 0.0
+        if old is not None:
+            delta += self._remove(i)
+        if new is not None:
+            delta += self._place(i, new)
+
+        if self._accept(delta, temperature):
+            return delta
+
+        if new is not None:
+            self._remove(i)
+        if old is not None:
+            self._place(i, old)
+        return None
+
+    def _try_swap(self, movable: List[int], temperature: float) -> Optional[float]:
+        """Exchange the tiles of two placed buildings. Returns the accepted delta."""
+        i = self.rng.choice(movable)
+        j = self.rng.choice(movable)
+        pos_i, pos_j = self.assignment[i], self.assignment[j]
+        if pos_i is None or pos_j is None or pos_i == pos_j:
+            return None
+        if self.buildings[i] == self.buildings[j]:
+            return None
+        if pos_j not in self.candidate_sets[i] or pos_i not in self.candidate_sets[j]:
+            return None
+
+        delta = self._remove(i) + self._remove(j)
+        delta += self._place(i, pos_j) + self._place(j, pos_i)
+        if self._accept(delta, temperature):
+            return delta
+
+        self._remove(i)
+        self._remove(j)
+        self._place(i, pos_i)
+        self._place(j, pos_j)
+        return None
+
+    def _place(self, i: int, pos: Position) -> float:
+        self.assignment[i] = pos
+        return self.optimizer._attach(self.buildings[i], pos, self.yield_priorities)
+
+    def _remove(self, i: int) -> float:
+        building = self.buildings[i]
+        pos = self.assignment[i]
+        self.optimizer._detach(building, pos)
+        self.assignment[i] = None
+        # Removing is exactly undoing the placement delta against what remains
+        return -self.optimizer._placement_delta(building, pos, self.yield_priorities)
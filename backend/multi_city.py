@@ -0,0 +1,180 @@
+# multi_city.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from backend.city_layout import CityLayout, YieldCalculator
+from backend.optimizer import CityOptimizer, OptimizationResult
+from backend.yield_table import YieldTable
+
+@dataclass
+class CityPlan:
+    """One settlement on a shared board and the buildings wanted in it."""
+    name: str
+    center: Tuple[int, int]  # (ring, index) on the board
+    buildings: List[str]
+    radius: int = CityLayout.DEFAULT_RADIUS  # rings of territory around the center
+
+@dataclass
+class MultiCityResult:
+    # Chosen placements per city name
+    placements: Dict[str, List[OptimizationResult]]
+    score: float
+    # City names searched together, one list per independent cluster
+    clusters: List[List[str]] = field(default_factory=list)
+    pruned_nodes: int = 0
+
+def _solve_cluster(job) -> Tuple[float, List[OptimizationResult], int]:
+    """Run one cluster's joint search (in a worker process or inline)."""
+    board, table, buildings, tile_masks, yield_priorities, options = job
+    optimizer = CityOptimizer(board, table)
+    results = optimizer.optimize_multiple_buildings(
+        buildings, yield_priorities, tile_masks=tile_masks, **options
+    )
+    return optimizer.best_score, results, optimizer.pruned_nodes
+
+class MultiCityOptimizer:
+    """
+    Places the buildings of several cities on one board (a CityLayout of
+    whatever radius covers them).
+
+    Each city's buildings may only go inside its own territory, the tiles
+    within `radius` of its center, so overlapping territories share tiles
+    and compete for their two building slots. Adjacency is read from the
+    whole board, so a building counts terrain in a neighbouring city's
+    territory too. Cities interact only through shared tiles (quarter
+    bonuses and the slot limit), so the cities are grouped into clusters
+    of overlapping territories. Each cluster is one joint CityOptimizer
+    search with per-building tile masks, and clusters are independent, so
+    with `workers` > 1 they are solved in a process pool.
+    """
+
+    def __init__(self, board: CityLayout, yield_table: Optional[YieldTable] = None):
+        self.board = board
+        self.yield_table = yield_table
+
+    def territory_mask(self, plan: CityPlan) -> int:
+        """
+        Bit mask (board tile order) of the tiles `plan` may build on: its
+        territory minus the center, which holds the palace.
+        """
+        if not self.board.topology.contains(tuple(plan.center)):
+            raise ValueError(f"City {plan.name} is centered off the board: {plan.center}")
+        mask = 0
+        for pos in self.board.topology.disk(tuple(plan.center), plan.radius):
+            mask |= 1 << self.board.bitboard.bit_index[pos]
+        return mask & ~self._center_bit(plan)
+
+    def _center_bit(self, plan: CityPlan) -> int:
+        return 1 << self.board.bitboard.bit_index[tuple(plan.center)]
+
+    def clusters(self, plans: List[CityPlan]) -> List[List[int]]:
+        """Indexes of `plans` grouped by overlapping territory, in plan order."""
+        masks = [self.territory_mask(plan) for plan in plans]
+        parent = list(range(len(plans)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i in range(len(plans)):
+            for j in range(i + 1, len(plans)):
+                if masks[i] & masks[j]:
+                    parent[find(j)] = find(i)
+
+        groups: Dict[int, List[int]] = {}
+        for i in range(len(plans)):
+            groups.setdefault(find(i), []).append(i)
+        return list(groups.values())
+
+    def optimize(
+        self,
+        plans: List[CityPlan],
+        yield_priorities: Dict[str, float] = None,
+        prune: bool = True,
+        strategy: str = "backtracking",
+        time_budget_ms: float = 1000,
+        seed: Optional[int] = None,
+        workers: int = 1
+    ) -> MultiCityResult:
+        """
+        Best placement of every city's buildings. Options are passed on to
+        each cluster's CityOptimizer run; `time_budget_ms` applies per cluster.
+        """
+        names = [plan.name for plan in plans]
+        if len(set(names)) != len(names):
+            raise ValueError("City names must be unique")
+        if yield_priorities is None:
+            yield_priorities = {y: 1.0 for y in YieldCalculator.YIELD_TYPES}
+
+        clusters = self.clusters(plans)
+        # No city builds on another city's center either
+        centers = 0
+        for plan in plans:
+            centers |= self._center_bit(plan)
+        masks = [self.territory_mask(plan) & ~centers for plan in plans]
+        table = self.yield_table
+        every_building = [b for plan in plans for b in plan.buildings]
+        if table is None or not table.covers(every_building, self.board):
+            table = YieldTable(self.board, every_building)
+
+        workers = max(1, min(workers, os.cpu_count() or 1))
+        pool_clusters = workers > 1 and len(clusters) > 1
+        options = dict(prune=prune, strategy=strategy, time_budget_ms=time_budget_ms, seed=seed,
+                       workers=1 if pool_clusters else workers)
+
+        jobs, owners = [], []
+        for cluster in clusters:
+            buildings, tile_masks, owner = [], [], []
+            for i in cluster:
+                buildings.extend(plans[i].buildings)
+                tile_masks.extend([masks[i]] * len(plans[i].buildings))
+                owner.extend([i] * len(plans[i].buildings))
+            jobs.append((self.board, table, buildings, tile_masks, yield_priorities, options))
+            owners.append((buildings, tile_masks, owner))
+
+        if pool_clusters:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                outcomes = list(pool.map(_solve_cluster, jobs))
+        else:
+            outcomes = [_solve_cluster(job) for job in jobs]
+
+        placements: Dict[str, List[OptimizationResult]] = {name: [] for name in names}
+        total, pruned_nodes = 0.0, 0
+        for (score, results, pruned), (buildings, tile_masks, owner) in zip(outcomes, owners):
+            total += score
+            pruned_nodes += pruned
+            for k, result in zip(self._owners(results, buildings, tile_masks), results):
+                placements[plans[owner[k]].name].append(result)
+
+        return MultiCityResult(
+            placements=placements,
+            score=total,
+            clusters=[[names[i] for i in cluster] for cluster in clusters],
+            pruned_nodes=pruned_nodes
+        )
+
+    def _owners(
+        self,
+        results: List[OptimizationResult],
+        buildings: List[str],
+        tile_masks: List[int]
+    ) -> List[int]:
+        """
+        Index in the cluster's building list of each result. Results come in
+        list order, so the earliest later index with the same name whose
+        mask allows the tile is always a valid owner (and any valid owner
+        scores the same).
+        """
+        bit_index = self.board.bitboard.bit_index
+        owners, k = [], 0
+        for result in results:
+            t = bit_index[result.position]
+            while buildings[k] != result.building or not tile_masks[k] >> t & 1:
+                k += 1
+            owners.append(k)
+            k += 1
+        return owners
@@ -1,8 +1,18 @@
 # optimizer.py
 
-from typing import Dict, List, Optional, Tuple
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass
+import numpy as np
 from backend.city_layout import CityLayout, YieldCalculator
+from backend.yield_table import YieldTable, table_for
+from backend.local_search import LocalSearch
+from backend import parallel_search
+from backend.bitboard import iter_bits
+from backend.tile_store import TileStore
+from backend.yield_vector import YieldVector
 
 @dataclass
 class OptimizationResult:
@@ -11,119 +21,769 @@ class OptimizationResult:
     yields: Dict[str, Dict[str, float]]
     score: float
 
+class SearchCancelled(Exception):
+    """Raised out of a search whose optimizer was cancelled."""
+
+@dataclass
+class _BuildingBound:
+    """Optimistic score data for one building in the list, used for pruning."""
+    building: str
+    # (score, tile column) for every tile the building may use, best first
+    positions: List[Tuple[float, int]]
+    # Most the building's share of a quarter can add: its own bonus, which
+    # it gets itself and also grants its partner
+    quarter_extra: float
+
+@dataclass
+class _Contender:
+    """A building whose only best free tile is the one being contested (see `_suffix_bound`)."""
+    building: str
+    # What it loses by going to its next best choice instead
+    drop: float
+    # What it loses by staying without forming a quarter
+    quarter: float
+
 class CityOptimizer:
-    """Handles optimization of building placement using a backtracking approach."""
+    """
+    Handles optimization of building placement. The default strategy is an
+    exact backtracking search; "local_search" runs a time-bounded simulated
+    annealing instead (see backend/local_search.py).
+    """
 
-    def __init__(self, city_layout: CityLayout):
+    STRATEGIES = ("backtracking", "local_search")
+    # Scores closer than this are ties. Running scores are float sums whose
+    # order depends on the search path, so equal arrangements can differ in
+    # the last bits; ties go to the arrangement first in canonical order
+    # (see `_improves`), not to whichever was found first.
+    SCORE_EPSILON = 1e-9
+    # Most (building index, layout hash) states remembered per run
+    TRANSPOSITION_TABLE_SIZE = 1 << 18
+    # Search nodes between cancellation and progress checks
+    CHECK_EVERY = 1024
+    # Entry of a choice order (see `_build_choice_orders`) for skipping the building
+    SKIP = -1
+
+    def __init__(self, city_layout: CityLayout, yield_table: Optional[YieldTable] = None):
         self.city = city_layout
+        # Compiled static yields; if not supplied, each run takes one from
+        # `table_for` (the shared cached table on city-sized layouts)
+        self.yield_table = yield_table
 
         # We'll keep track of best arrangement across the recursion
         self.best_score: float = float("-inf")
         # A list of tuples: (building_name, (ring, index)) for each placed building
         self.best_arrangement: List[Tuple[str, Tuple[int, int]]] = []
 
+        # Branch-and-bound state
+        self.prune: bool = True
+        self.pruned_nodes: int = 0
+        # Per building list index; None for buildings that can only be skipped
+        self._bounds: List[Optional[_BuildingBound]] = []
+        # Lowest quarter score among the listed buildings (at most 0)
+        self._quarter_floor: float = 0.0
+        # Incumbent score shared with other worker processes (parallel mode only)
+        self._shared_best = None
+
+        # Visited (current_idx, zobrist_hash) states, LRU-bounded, with the
+        # choices that first reached them. Only used when copies of a building
+        # are not already ordered by symmetry breaking, since otherwise no
+        # state can be reached twice.
+        self._transpositions: Optional["OrderedDict[Tuple[int, int], List[int]]"] = None
+        self.transposition_hits: int = 0
+
+        # Cooperative cancellation and progress. cancel() may be called from
+        # another thread; the search notices at its next check, every
+        # CHECK_EVERY nodes, which is also when progress_callback is called.
+        self.nodes_explored: int = 0
+        self.progress_callback: Optional[Callable[["CityOptimizer"], None]] = None
+        # Called with (best_score, best_arrangement) whenever the search finds
+        # a better arrangement, from the search's thread
+        self.incumbent_callback: Optional[Callable[[float, List[Tuple[str, Tuple[int, int]]]], None]] = None
+        self._cancel = threading.Event()
+
+        # Symmetry breaking: interchangeable buildings take choices in list order.
+        # _symmetry_prev[i] is the previous interchangeable building's list
+        # index (or -1); _choice_keys[i] is the rank, in _choice_orders[i], of
+        # the choice building i took on the current path. The choice keys of
+        # the best arrangement are its canonical order for breaking ties.
+        self.break_symmetry: bool = True
+        self._symmetry_prev: List[int] = []
+        self._choice_keys: List[int] = []
+        self._best_keys: List[int] = []
+
+        # Choices for each building in the list, in search order: tile
+        # columns it may use, and SKIP
+        self._choice_orders: List[List[int]] = []
+
+        # Tiles each building in the list may use, as bit masks over the
+        # layout's tiles (-1: anywhere). Set per run from `tile_masks`.
+        self._tile_masks: List[int] = []
+
+        # Incremental scoring state, reset per optimization run
+        self._table: Optional[YieldTable] = None
+        # Static score per [building row][tile column] of the yield table
+        self._static_scores: List[List[float]] = []
+        self._quarter_scores: Dict[str, float] = {}
+        # Buildings placed by the search on each tile (excludes pre-existing ones)
+        self._placed: Dict[Tuple[int, int], List[str]] = {}
+
     def optimize_multiple_buildings(
         self,
         buildings: List[str],
-        yield_priorities: Dict[str, float] = None
+        yield_priorities: Dict[str, float] = None,
+        prune: bool = True,
+        strategy: str = "backtracking",
+        time_budget_ms: float = 1000,
+        seed: Optional[int] = None,
+        workers: int = 1,
+        tile_masks: Optional[List[int]] = None
     ) -> List[OptimizationResult]:
         """
-        Main entry point for global optimization of multiple buildings
-        using backtracking. Returns a list of OptimizationResult describing
+        Main entry point for global optimization of multiple buildings,
+        using backtracking by default. Returns a list of OptimizationResult describing
         each building's final chosen position and yields.
 
         If skipping a building is allowed, we handle that in the recursion.
+
+        With `prune` enabled (the default) the search runs as branch-and-bound:
+        a subtree is cut as soon as its partial score plus an optimistic bound
+        for the unplaced buildings cannot beat `best_score`. The optimum is the
+        same as the exhaustive search; `self.pruned_nodes` counts the cuts.
+
+        With strategy="local_search" the arrangement comes from simulated
+        annealing seeded by `seed`, returning the best arrangement found within
+        `time_budget_ms`. Use it when the building list is too long for the
+        exact search.
+
+        With `workers` > 1 the backtracking tree is split at its first levels
+        and the subtrees are searched in a process pool (see
+        backend/parallel_search.py). The result is identical to serial mode.
+
+        `tile_masks`, if given, holds one bit mask per building (bits in the
+        layout's tile order) limiting where that building may go; the
+        multi-city optimizer uses it to keep each city's buildings inside
+        its own territory.
         """
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown optimization strategy: {strategy}")
 
         if yield_priorities is None:
             # If user didn't specify, give each yield type a priority of 1.0
             yield_priorities = {y: 1.0 for y in YieldCalculator.YIELD_TYPES}
 
-        # Clear out old best arrangement
-        self.best_score = float("-inf")
-        self.best_arrangement = []
+        self._prepare_run(buildings, yield_priorities, prune and strategy == "backtracking", tile_masks)
 
-        # Start recursion from the first building
-        # We'll pass along a "current arrangement" that we build up
-        self._backtrack_place_building(
-            buildings=buildings,
-            current_idx=0,
-            yield_priorities=yield_priorities,
-            current_arrangement=[]
-        )
+        mark = self.city.savepoint()
+        try:
+            if strategy == "local_search":
+                search = LocalSearch(self, buildings, yield_priorities, seed)
+                self.best_score, self.best_arrangement = search.run(time_budget_ms)
+            else:
+                if self.prune:
+                    self._seed_incumbent(buildings, yield_priorities)
+                if workers > 1 and buildings:
+                    self.best_score, self.best_arrangement, self.pruned_nodes = (
+                        parallel_search.parallel_backtrack(self, buildings, yield_priorities, workers)
+                    )
+                else:
+                    # Start recursion from the first building
+                    # We'll pass along a "current arrangement" that we build up
+                    self._backtrack_place_building(
+                        buildings=buildings,
+                        current_idx=0,
+                        yield_priorities=yield_priorities,
+                        current_arrangement=[],
+                        current_score=0.0
+                    )
+        except SearchCancelled:
+            # Take the search's half-finished placements back off the layout
+            # (local search cleans up after itself)
+            self.city.rollback(mark)
+            raise
 
-        # Build final results
+        return self.arrangement_results(self.best_arrangement, yield_priorities)
+
+    def arrangement_results(
+        self,
+        arrangement: List[Tuple[str, Tuple[int, int]]],
+        yield_priorities: Dict[str, float]
+    ) -> List[OptimizationResult]:
+        """
+        Results for a (building, position) arrangement, each with its yields
+        with the whole arrangement placed, so quarter bonuses between its
+        buildings are included and the scores add up to the arrangement's
+        search score. The layout is left as it was.
+        """
         final_results: List[OptimizationResult] = []
-        for (bldg, (ring, idx)) in self.best_arrangement:
-            # We can recalc yields for display
-            yds = self.city.calculate_building_yields(ring, idx, bldg)
-            score_val = self._calculate_position_score(yds['total_yields'], yield_priorities)
-            result = OptimizationResult(
+        mark = self.city.savepoint()
+        try:
+            for (bldg, (ring, idx)) in arrangement:
+                self.city.place(ring, idx, bldg, validate=False)
+            for (bldg, (ring, idx)) in arrangement:
+                # We can recalc yields for display
+                yds = self.city.calculate_building_yields(ring, idx, bldg)
+                score_val = self._calculate_position_score(yds['total_yields'], yield_priorities)
+                result = OptimizationResult(
+                    position=(ring, idx),
+                    building=bldg,
+                    yields=yds,
+                    score=score_val
+                )
+                final_results.append(result)
+        finally:
+            self.city.rollback(mark)
+
+        return final_results
+
+    def optimize_building_placement(
+        self,
+        building: str,
+        yield_priorities: Dict[str, float] = None
+    ) -> Optional[OptimizationResult]:
+        """
+        Best tile for one more `building` on the layout as it stands, or None
+        if the building is unknown or has nowhere to go.
+        """
+        ranked = self.rank_building_placements(building, yield_priorities, top_k=1)
+        return ranked[0] if ranked else None
+
+    def rank_building_placements(
+        self,
+        building: str,
+        yield_priorities: Dict[str, float] = None,
+        top_k: int = 5
+    ) -> List[OptimizationResult]:
+        """
+        The `top_k` best tiles for one more `building`, best first, with
+        their yield breakdowns. Ties keep tile order.
+
+        Scores every tile in one pass over the compiled yield table: the
+        building's static score row, plus the quarter bonuses exchanged with
+        the buildings already on each tile grant it. No search is involved, so this
+        is cheap enough for interactive "where does this go" queries.
+        """
+        if yield_priorities is None:
+            yield_priorities = {y: 1.0 for y in YieldCalculator.YIELD_TYPES}
+        if building not in self.city.building_data or top_k <= 0:
+            return []
+
+        table = self.yield_table
+        if table is None or not table.covers([building], self.city):
+            table = table_for(self.city, [building])
+        b = table.building_index[building]
+        free = table.valid_masks[b] & ~self.city.bitboard.full
+        if not free:
+            return []
+
+        # Own score: static row (base, adjacency) plus, where a differently
+        # named building is already on the tile, its own quarter bonus and
+        # what the partners grant
+        scores = table.static_scores(yield_priorities)[b].copy()
+        self._quarter_scores = {}
+        for t in iter_bits(self.city.bitboard.occupied & free):
+            partners = [p for p in self.city.buildings_at(*table.positions[t]) if p != building]
+            if partners:
+                scores[t] += self._quarter_score(building, yield_priorities)
+                scores[t] += sum(self._quarter_score(p, yield_priorities) for p in partners)
+
+        candidates = np.fromiter(iter_bits(free), dtype=np.int64)
+        order = candidates[np.argsort(-scores[candidates], kind="stable")][:top_k]
+
+        results = []
+        for t in order.tolist():
+            ring, idx = table.positions[t]
+            yds = self.city.calculate_building_yields(ring, idx, building)
+            results.append(OptimizationResult(
                 position=(ring, idx),
-                building=bldg,
+                building=building,
                 yields=yds,
-                score=score_val
-            )
-            final_results.append(result)
+                score=self._calculate_position_score(yds['total_yields'], yield_priorities)
+            ))
+        return results
 
-        return final_results
+    def _prepare_run(
+        self,
+        buildings: List[str],
+        yield_priorities: Dict[str, float],
+        prune: bool,
+        tile_masks: Optional[List[int]] = None
+    ):
+        """Reset search state and derive this run's scores from the yield table."""
+        # Clear out old best arrangement
+        self.best_score = float("-inf")
+        self.best_arrangement = []
+        self._best_keys = []
+        self.prune = prune
+        self.pruned_nodes = 0
+
+        table = self.yield_table
+        if table is None or not table.covers(buildings, self.city):
+            table = table_for(self.city, buildings)
+        self._table = table
+        self._static_scores = table.static_scores(yield_priorities).tolist()
+        self._quarter_scores = dict(zip(table.buildings, table.quarter_scores(yield_priorities).tolist()))
+        self._placed = {pos: [] for pos in self.city.tiles}
+        if tile_masks is not None and len(tile_masks) != len(buildings):
+            raise ValueError("tile_masks needs one mask per building")
+        self._tile_masks = list(tile_masks) if tile_masks is not None else [-1] * len(buildings)
+        self._choice_orders = self._build_choice_orders(buildings)
+        self._bounds = self._build_bounds(buildings, yield_priorities) if prune else []
+        self._symmetry_prev = self._symmetry_links(buildings, self._tile_masks) if self.break_symmetry else [-1] * len(buildings)
+        self._transpositions = OrderedDict() if self._has_unlinked_copies(buildings) else None
+        self.transposition_hits = 0
+        self._choice_keys = [0] * len(buildings)
+        self.nodes_explored = 0
+
+    def cancel(self):
+        """Ask a running search (possibly in another thread) to stop with SearchCancelled."""
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def _new_incumbent(self):
+        """Hand the new best_score / best_arrangement to incumbent_callback."""
+        if self.incumbent_callback is not None:
+            self.incumbent_callback(self.best_score, self.best_arrangement)
+
+    def _improves(self, score: float, keys: List[int]) -> bool:
+        """
+        True if an arrangement with this score and these choice keys should
+        replace the incumbent: it scores higher, or ties and its keys come
+        first lexicographically (building by building, the choice that is
+        better on its own). The order depends only on the layout, list and
+        priorities, not on when arrangements are found, so the greedy seed,
+        the serial search and parallel workers all settle ties the same way.
+        """
+        if score > self.best_score + self.SCORE_EPSILON:
+            return True
+        return score >= self.best_score - self.SCORE_EPSILON and keys < self._best_keys
+
+    def _seed_incumbent(self, buildings: List[str], yield_priorities: Dict[str, float]):
+        """
+        Start branch-and-bound from a greedy arrangement, so pruning bites
+        from the first node: in list order, each building takes the choice
+        (free tile or skip) with the largest score change. The seed keeps the
+        symmetry-breaking order, so the search can reach it.
+        """
+        score = 0.0
+        arrangement: List[Tuple[str, Tuple[int, int]]] = []
+        try:
+            for idx, building in enumerate(buildings):
+                best = None
+                for rank, pos in self._choices(idx, self._min_choice_key(idx)):
+                    delta = 0.0 if pos is None else self._placement_delta(building, pos, yield_priorities)
+                    if best is None or delta > best[0]:
+                        best = (delta, rank, pos)
+                if best is None:
+                    return  # No arrangement along this path; search unseeded
+                _, self._choice_keys[idx], pos = best
+                if pos is not None:
+                    score += self._place(building, pos, yield_priorities)
+                    arrangement.append((building, pos))
+
+            self.best_score = score
+            self.best_arrangement = list(arrangement)
+            self._best_keys = list(self._choice_keys)
+            self._new_incumbent()
+        finally:
+            for building, pos in reversed(arrangement):
+                self._unplace(building, pos)
+
+    def _check_in(self):
+        """Periodic search hook: stop if cancelled, otherwise report progress."""
+        if self._cancel.is_set():
+            raise SearchCancelled()
+        if self.progress_callback is not None:
+            self.progress_callback(self)
 
     def _backtrack_place_building(
         self,
         buildings: List[str],
         current_idx: int,
         yield_priorities: Dict[str, float],
-        current_arrangement: List[Tuple[str, Tuple[int, int]]]
+        current_arrangement: List[Tuple[str, Tuple[int, int]]],
+        current_score: float
     ):
         """
         Recursive function to try all ways of placing building `buildings[current_idx]`.
         We can also skip placing it entirely, if that's allowed by game rules.
 
-        Once we've assigned all buildings, we compute the total yield-based score
-        and update `self.best_arrangement` if we found a better solution.
+        `current_score` is the running score of `current_arrangement`, updated
+        by `_placement_delta` as buildings are placed, so reaching a leaf costs
+        O(1) instead of re-scoring every placed building.
         """
 
-        # If we've processed all buildings, evaluate the arrangement's total score
+        self.nodes_explored += 1
+        if not self.nodes_explored % self.CHECK_EVERY:
+            self._check_in()
+
+        # If we've processed all buildings, the running score is the arrangement's total
         if current_idx >= len(buildings):
-            total_score = self._score_entire_arrangement(current_arrangement, yield_priorities)
-            if total_score > self.best_score:
-                self.best_score = total_score
+            if self._improves(current_score, self._choice_keys):
+                self.best_score = current_score
                 self.best_arrangement = current_arrangement.copy()
+                self._best_keys = list(self._choice_keys)
+                self._new_incumbent()
+                if self._shared_best is not None:
+                    parallel_search.publish_incumbent(self._shared_best, current_score)
             return
 
+        # Choices made so far; every arrangement below comes after them in canonical order
+        prefix = self._choice_keys[:current_idx]
+
+        # Transpositions: the same buildings on the same tiles at the same depth
+        # means the same running score and the same subtree. A repeat can only
+        # win a tie if its choices come first, so otherwise it is skipped.
+        if self._transpositions is not None:
+            key = (current_idx, self.city.zobrist_hash)
+            seen = self._transpositions.get(key)
+            if seen is not None and prefix > seen:
+                self._transpositions.move_to_end(key)
+                self.transposition_hits += 1
+                return
+            self._transpositions[key] = prefix
+            self._transpositions.move_to_end(key)
+            if len(self._transpositions) > self.TRANSPOSITION_TABLE_SIZE:
+                self._transpositions.popitem(last=False)
+
+        # Branch-and-bound: stop if even the best case can't beat the incumbent,
+        # or can only tie it with arrangements that come later in canonical order.
+        # Another worker's incumbent only prunes strictly, so ties still resolve
+        # the way the serial search would resolve them.
+        if self.prune and (self.best_score > float("-inf") or self._shared_best is not None):
+            bound = current_score + self._suffix_bound(buildings, current_idx)
+            if bound < self.best_score - self.SCORE_EPSILON or (
+                bound <= self.best_score + self.SCORE_EPSILON
+                and prefix > self._best_keys[:current_idx]
+            ) or (
+                self._shared_best is not None
+                and bound < self._shared_best.value - self.SCORE_EPSILON
+            ):
+                self.pruned_nodes += 1
+                return
+
         building = buildings[current_idx]
 
-        # 1) Option to skip placing this building
-        #    If the game always allows skipping, do so:
-        self._backtrack_place_building(
-            buildings,
-            current_idx + 1,
-            yield_priorities,
-            current_arrangement
-        )
-
-        # 2) Try placing the building on each valid tile
-        for ring in range(4):  # ring = 0..3
-            max_idx = 1 if ring == 0 else 6 * ring
-            for idx in range(max_idx):
-                if self.city.is_valid_building_location(ring, idx, building):
-                    # Temporarily place building
-                    self.city.add_building(ring, idx, building)
-                    current_arrangement.append((building, (ring, idx)))
-
-                    # Recurse for next building
-                    self._backtrack_place_building(
-                        buildings,
-                        current_idx + 1,
-                        yield_priorities,
-                        current_arrangement
+        # Try each choice for the building, best first: a valid tile with a
+        # free slot (placed temporarily), or skipping it, which the game
+        # always allows
+        for rank, pos in self._choices(current_idx, self._min_choice_key(current_idx)):
+            self._choice_keys[current_idx] = rank
+            if pos is None:
+                self._backtrack_place_building(
+                    buildings,
+                    current_idx + 1,
+                    yield_priorities,
+                    current_arrangement,
+                    current_score
+                )
+                continue
+
+            delta = self._place(building, pos, yield_priorities)
+            current_arrangement.append((building, pos))
+
+            # Recurse for next building
+            self._backtrack_place_building(
+                buildings,
+                current_idx + 1,
+                yield_priorities,
+                current_arrangement,
+                current_score + delta
+            )
+
+            # BACKTRACK: remove building
+            current_arrangement.pop()
+            self._unplace(building, pos)
+
+    def _build_choice_orders(self, buildings: List[str]) -> List[List[int]]:
+        """
+        Choices for each building in the list: the tile columns it may use
+        (valid for it and in its tile mask) and SKIP, ordered by what the
+        choice is worth on its own (static score; 0 for skipping), best
+        first. Skipping goes before tiles that are worth no more than it,
+        other ties in column order. Trying good tiles first finds strong
+        incumbents early, so more of the tree is pruned. Lists are shared
+        between equal (building, tile mask) pairs.
+        """
+        table = self._table
+        shared: Dict[Tuple[str, int], List[int]] = {}
+        orders: List[List[int]] = []
+        for building, tile_mask in zip(buildings, self._tile_masks):
+            if (building, tile_mask) not in shared:
+                b = table.building_index.get(building)
+                if b is None:
+                    shared[(building, tile_mask)] = [self.SKIP]  # Unknown building: it can only be skipped
+                else:
+                    row = self._static_scores[b]
+                    ranked = [(-row[t], 1, t) for t in iter_bits(table.valid_masks[b] & tile_mask)]
+                    ranked.append((0.0, 0, self.SKIP))
+                    shared[(building, tile_mask)] = [t for _, _, t in sorted(ranked)]
+            orders.append(shared[(building, tile_mask)])
+        return orders
+
+    def _choices(self, idx: int, min_key: int = 0) -> List[Tuple[int, Optional[Tuple[int, int]]]]:
+        """
+        (rank, tile) for the choices building `idx` of the list has right
+        now, in search order from rank `min_key` on; the tile is None for
+        skipping. Full tiles are left out.
+        """
+        full = self.city.bitboard.full
+        positions = self._table.positions
+        order = self._choice_orders[idx]
+        return [
+            (rank, None if t == self.SKIP else positions[t])
+            for rank, t in enumerate(order[min_key:], min_key)
+            if t == self.SKIP or not full >> t & 1
+        ]
+
+    def _min_choice_key(self, idx: int) -> int:
+        """
+        Lowest choice rank allowed for building `idx` on the current path:
+        the rank the previous interchangeable building took (0 if none).
+        """
+        prev = self._symmetry_prev[idx]
+        return self._choice_keys[prev] if prev >= 0 else 0
+
+    def _symmetry_links(self, buildings: List[str], tile_masks: Optional[List[int]] = None) -> List[int]:
+        """
+        Link each building to the previous interchangeable one in the list.
+
+        Copies of the same building are interchangeable when they may use the
+        same tiles (the same `tile_masks` entry). Different buildings are too
+        when buildings.json gives them the same yields,
+        adjacency rules and placement requirements and neither has a quarter
+        bonus (a bonus is only exchanged between differently named buildings,
+        so swapping names could change it). Interchangeable buildings share
+        one choice order, and making each group take choices in
+        non-decreasing rank keeps one representative of every permutation.
+        The representative is also the first of its permutations in
+        canonical order (see `_improves`), so the result is unchanged.
+        """
+        def signature(name: str):
+            info = self.city.building_data.get(name)
+            if info is None or any(info.get('quarter_bonuses', {}).values()):
+                return ("name", name)
+            return ("yields", json.dumps(
+                [info.get('yields', {}), info.get('adjacency_rules', []),
+                 info.get('placement_requirements', {})],
+                sort_keys=True
+            ))
+
+        last_seen: Dict[Tuple, int] = {}
+        links: List[int] = []
+        for idx, building in enumerate(buildings):
+            sig = (signature(building), tile_masks[idx] if tile_masks is not None else -1)
+            links.append(last_seen.get(sig, -1))
+            last_seen[sig] = idx
+        return links
+
+    def _has_unlinked_copies(self, buildings: List[str]) -> bool:
+        """
+        True if two copies of a building sit in different symmetry chains
+        (different tile masks, or symmetry breaking off). Copies in one chain
+        take tiles in a fixed order, so swapping them can't reach a state
+        twice; only unlinked copies make the transposition table pay off.
+        """
+        chains: List[int] = []
+        seen: Dict[str, int] = {}
+        for idx, building in enumerate(buildings):
+            prev = self._symmetry_prev[idx]
+            chains.append(idx if prev < 0 else chains[prev])
+            if seen.setdefault(building, chains[idx]) != chains[idx]:
+                return True
+        return False
+
+    def _place(self, building: str, pos: Tuple[int, int], yield_priorities: Dict[str, float]) -> float:
+        """
+        Put a search building on the layout and return the score change.
+        Recorded on the layout's undo trail; take it back with `_unplace`.
+        """
+        # Score change must be taken before the building joins the tile
+        delta = self._placement_delta(building, pos, yield_priorities)
+        # Validity was checked by _choices
+        self.city.place(pos[0], pos[1], building, validate=False)
+        self._placed[pos].append(building)
+        return delta
+
+    def _unplace(self, building: str, pos: Tuple[int, int]):
+        """Undo the most recent `_place`, which must be `building` at `pos`."""
+        self._placed[pos].pop()
+        self.city.undo()
+
+    def _attach(self, building: str, pos: Tuple[int, int], yield_priorities: Dict[str, float]) -> float:
+        """Like `_place`, but untracked, so `_detach` can remove it in any order."""
+        delta = self._placement_delta(building, pos, yield_priorities)
+        self.city._attach_building(pos[0], pos[1], building)
+        self._placed[pos].append(building)
+        return delta
+
+    def _detach(self, building: str, pos: Tuple[int, int]):
+        """Take a building added by `_attach` back off the layout."""
+        self._placed[pos].remove(building)
+        self.city.remove_building(pos[0], pos[1], building)
+
+    def _build_bounds(
+        self,
+        buildings: List[str],
+        yield_priorities: Dict[str, float]
+    ) -> List[Optional[_BuildingBound]]:
+        """
+        Precompute, per building in the list, the score it would get alone on
+        every tile it may use, plus the most its share of a quarter could add.
+        Used by `_suffix_bound`.
+
+        A quarter of two search buildings X and P is worth 2*q(X) + 2*q(P)
+        (each gets its own bonus and the other's), so each bonus is charged
+        once, as 2*q to the building that grants it. Bonuses of buildings
+        already on the layout are left to `_suffix_bound`.
+        """
+        # Pre-existing buildings' quarter scores are looked up by _suffix_bound
+        for pos in self.city.tiles:
+            for existing in self.city.buildings_at(*pos):
+                self._quarter_score(existing, yield_priorities)
+
+        table = self._table
+        bounds: List[Optional[_BuildingBound]] = []
+        self._quarter_floor = 0.0
+        for idx, building in enumerate(buildings):
+            b = table.building_index.get(building)
+            if b is None:
+                bounds.append(None)
+                continue
+            row = self._static_scores[b]
+            given = self._quarter_score(building, yield_priorities)
+            self._quarter_floor = min(self._quarter_floor, given)
+            bounds.append(_BuildingBound(
+                building=building,
+                positions=[(row[t], t) for t in self._choice_orders[idx] if t != self.SKIP],
+                quarter_extra=max(0.0, 2 * given)
+            ))
+        return bounds
+
+    def _suffix_bound(self, buildings: List[str], start_idx: int) -> float:
+        """
+        Optimistic score the buildings from `start_idx` onward can still add:
+        each takes its best tile that has a free slot, or is skipped (0).
+        When more buildings have the same single best tile than it has free
+        slots (or copies of one building would have to share it), the ones
+        cheapest to move are charged their drop to their next best choice.
+
+        A building alone on its tile may yet be joined. For one placed by
+        the search that pays its share of the quarter (2*q); for one already
+        on the layout, which is not scored, the newcomer gets its bonus
+        (q(E), less any shortfall of the newcomer's own share). Each later
+        building joins at most one of them.
+        """
+        bound = 0.0
+        remaining = 0
+        full = self.city.bitboard.full
+        # Best tile column -> buildings for which it is the only best tile
+        contested: Dict[int, List[_Contender]] = {}
+        for info in self._bounds[start_idx:]:
+            if info is None:
+                continue
+            best = None
+            for score, t in info.positions:
+                if full >> t & 1:
+                    continue
+                value = max(0.0, score + info.quarter_extra)
+                if best is None:
+                    best = (value, score, t)
+                    bound += value
+                    remaining += 1
+                    continue
+                if value < best[0]:
+                    contested.setdefault(best[2], []).append(
+                        _Contender(info.building, best[0] - value, best[0] - max(0.0, best[1]))
                     )
+                break
+            else:
+                if best is not None and best[0] > 0:
+                    contested.setdefault(best[2], []).append(
+                        _Contender(info.building, best[0], best[0] - max(0.0, best[1]))
+                    )
+
+        positions = self._table.positions
+        for t, contenders in contested.items():
+            free_slots = TileStore.SLOTS - len(self.city.buildings_at(*positions[t]))
+            bound -= self._contested_loss(contenders, free_slots)
+
+        shares = []
+        bitboard = self.city.bitboard
+        for t in iter_bits(bitboard.occupied & ~bitboard.full):
+            pos = positions[t]
+            if self._placed[pos]:
+                share = 2 * self._quarter_scores[self._placed[pos][0]]
+            else:
+                share = self._quarter_scores[self.city.buildings_at(*pos)[0]] - self._quarter_floor
+            if share > 0:
+                shares.append(share)
+        if len(shares) > remaining:
+            shares = sorted(shares, reverse=True)[:remaining]
+        return bound + sum(shares)
+
+    @staticmethod
+    def _contested_loss(contenders: List["_Contender"], free_slots: int) -> float:
+        """
+        Least the contenders for one tile must give up: at most `free_slots`
+        of them stay on it and the rest drop to their next best choice. Two
+        copies of one building staying together form no quarter, so they
+        both lose their quarter share instead.
+        """
+        total = sum(c.drop for c in contenders)
+        kept = max((c.drop for c in contenders), default=0.0)
+        if free_slots >= 2:
+            for i, a in enumerate(contenders):
+                for b in contenders[i + 1:]:
+                    saved = a.drop + b.drop
+                    if a.building == b.building:
+                        saved -= a.quarter + b.quarter
+                    kept = max(kept, saved)
+        return total - kept
+
+    def _quarter_score(self, building: str, yield_priorities: Dict[str, float]) -> float:
+        """
+        Weighted value of the quarter bonus `building` grants a tile partner.
+        Table buildings are filled in per run; others (e.g. buildings already
+        on the layout) are looked up on first use.
+        """
+        if building not in self._quarter_scores:
+            building_info = self.city.building_data.get(building, {})
+            self._quarter_scores[building] = self._calculate_position_score(
+                building_info.get('quarter_bonuses', {}), yield_priorities
+            )
+        return self._quarter_scores[building]
 
-                    # BACKTRACK: remove building
-                    current_arrangement.pop()
-                    tile = self.city.get_tile(ring, idx)
-                    if tile and building in tile.buildings:
-                        tile.buildings.remove(building)
+    def _placement_delta(
+        self,
+        building: str,
+        pos: Tuple[int, int],
+        yield_priorities: Dict[str, float]
+    ) -> float:
+        """
+        Change in arrangement score from placing `building` at `pos`, given
+        the buildings currently on that tile. Only the new building's own
+        yields and the quarter formed with a differently named tile partner
+        change: both sides then get their own bonus plus the other's.
+        Pre-existing buildings are not scored, so they only give a bonus.
+        """
+        table = self._table
+        delta = self._static_scores[table.building_index[building]][table.position_index[pos]]
+        on_tile = self.city.buildings_at(*pos)
+        partners = [p for p in on_tile if p != building]
+        if not partners:
+            return delta
+        given = self._quarter_score(building, yield_priorities)
+        delta += given + sum(self._quarter_score(p, yield_priorities) for p in partners)
+        for partner in self._placed[pos]:
+            if partner != building:
+                delta += given
+                # The partner's own bonus starts counting if it was alone
+                if all(o == partner for o in on_tile):
+                    delta += self._quarter_score(partner, yield_priorities)
+        return delta
 
     def _score_entire_arrangement(
         self,
@@ -131,14 +791,18 @@ class CityOptimizer:
         yield_priorities: Dict[str, float]
     ) -> float:
         """
-        Compute the total score for a given arrangement. Because adjacency
-        depends on the presence of other buildings, we rely on the fact that
-        we've physically placed them in self.city's tiles as well.
+        Compute the total score for a given arrangement from scratch. Because
+        adjacency depends on the presence of other buildings, we rely on the
+        fact that we've physically placed them in self.city's tiles as well.
+        The search itself keeps a running score; this is the reference it
+        must agree with.
         """
+        weights = YieldVector.from_dict(yield_priorities)
         total_score = 0.0
         for (bldg, (r, i)) in arrangement:
-            all_yields = self.city.calculate_building_yields(r, i, bldg)
-            total_score += self._calculate_position_score(all_yields['total_yields'], yield_priorities)
+            yields = self.city.building_yield_vectors(r, i, bldg)
+            if yields is not None:
+                total_score += yields.total.dot(weights)
         return total_score
 
     def _calculate_position_score(
@@ -147,10 +811,7 @@ class CityOptimizer:
         priorities: Dict[str, float]
     ) -> float:
         """
-        Weighted sum of yields. Example: total_score += yields["culture"] * priorities["culture"] ...
+        Weighted sum of yields, as a dot product of the two dicts' vectors.
+        Example: total_score += yields["culture"] * priorities["culture"] ...
         """
-        score = 0.0
-        for yld_type, amount in yields.items():
-            prio = priorities.get(yld_type, 0.0)
-            score += amount * prio
-        return score
+        return YieldVector.from_dict(yields).dot(YieldVector.from_dict(priorities))
@@ -0,0 +1,196 @@
+# parallel_search.py
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    from backend.optimizer import CityOptimizer
+
+Placement = Tuple[str, Tuple[int, int]]
+# Choice rank (see CityOptimizer._choices) taken by each of the first `depth` buildings
+Decisions = List[int]
+
+# Per-process search state, set up once by _init_worker
+_WORKER: Dict[str, Any] = {}
+
+# Seconds between progress/cancellation checks while workers run
+CHECK_INTERVAL = 0.1
+
+def pool_context():
+    """
+    Start method for worker processes. Searches run from job-queue and
+    request threads, and forking a multi-threaded process can copy a lock
+    another thread holds (logging, the game-data and codebook locks) and
+    deadlock the child, so workers come from a forkserver (or are spawned
+    where there is none) instead of a fork of this process.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+def choose_split_depth(optimizer: "CityOptimizer", buildings: List[str], workers: int) -> int:
+    """
+    Split at the first building level if that already gives every worker a
+    few subtrees to balance load, otherwise at the first two levels.
+    """
+    first_level = len(optimizer._choices(0))
+    if len(buildings) < 2 or first_level >= 4 * workers:
+        return 1
+    return 2
+
+def enumerate_subproblems(
+    optimizer: "CityOptimizer",
+    buildings: List[str],
+    yield_priorities: Dict[str, float],
+    depth: int
+) -> List[Decisions]:
+    """
+    Every way of deciding `buildings[:depth]` (skip or place on a free tile)
+    that the serial search would visit, in the same order.
+    """
+    prefixes: List[Decisions] = []
+
+    def walk(idx: int, decisions: Decisions):
+        if idx == depth:
+            prefixes.append(list(decisions))
+            return
+        building = buildings[idx]
+        for rank, pos in optimizer._choices(idx, optimizer._min_choice_key(idx)):
+            optimizer._choice_keys[idx] = rank
+            if pos is not None:
+                optimizer._place(building, pos, yield_priorities)
+            decisions.append(rank)
+            walk(idx + 1, decisions)
+            decisions.pop()
+            if pos is not None:
+                optimizer._unplace(building, pos)
+
+    walk(0, [])
+    return prefixes
+
+def publish_incumbent(shared_best, score: float):
+    """Raise the cross-process incumbent to `score` if it is higher."""
+    with shared_best.get_lock():
+        if score > shared_best.value:
+            shared_best.value = score
+
+def _init_worker(shared_best, stop, city, table, buildings, yield_priorities, prune, tile_masks, depth, seed):
+    from backend.optimizer import CityOptimizer
+
+    optimizer = CityOptimizer(city, table)
+    optimizer._prepare_run(buildings, yield_priorities, prune, tile_masks)
+    optimizer._shared_best = shared_best
+    # The parent sets `stop` to cancel; the worker's searches check it like a local cancel()
+    optimizer._cancel = stop
+    _WORKER.update(
+        optimizer=optimizer,
+        buildings=buildings,
+        yield_priorities=yield_priorities,
+        depth=depth,
+        seed=seed
+    )
+
+def _solve_subproblem(decisions: Decisions) -> Tuple[float, List[Placement], List[int], int, int]:
+    """
+    Search the subtree under `decisions` on this worker's own layout copy,
+    starting from the parent's seed incumbent.
+    Returns (best_score, best_arrangement, best choice keys, pruned_nodes, nodes_explored).
+    """
+    optimizer = _WORKER["optimizer"]
+    buildings = _WORKER["buildings"]
+    yield_priorities = _WORKER["yield_priorities"]
+
+    optimizer.best_score, optimizer.best_arrangement, optimizer._best_keys = _WORKER["seed"]
+    optimizer.pruned_nodes = 0
+    optimizer.nodes_explored = 0
+
+    mark = optimizer.city.savepoint()
+    score = 0.0
+    prefix: List[Placement] = []
+    for idx, rank in enumerate(decisions):
+        optimizer._choice_keys[idx] = rank
+        t = optimizer._choice_orders[idx][rank]
+        if t == optimizer.SKIP:
+            continue
+        pos = optimizer._table.positions[t]
+        score += optimizer._place(buildings[idx], pos, yield_priorities)
+        prefix.append((buildings[idx], pos))
+    try:
+        optimizer._backtrack_place_building(
+            buildings,
+            _WORKER["depth"],
+            yield_priorities,
+            list(prefix),
+            score
+        )
+    finally:
+        # Unwinds the prefix, and the rest of the subtree if it was cancelled midway
+        optimizer.city.rollback(mark)
+        for placed in optimizer._placed.values():
+            placed.clear()
+    return (optimizer.best_score, optimizer.best_arrangement, optimizer._best_keys,
+            optimizer.pruned_nodes, optimizer.nodes_explored)
+
+def parallel_backtrack(
+    optimizer: "CityOptimizer",
+    buildings: List[str],
+    yield_priorities: Dict[str, float],
+    workers: int
+) -> Tuple[float, List[Placement], int]:
+    """
+    Run the optimizer's backtracking search across a process pool.
+
+    The tree is cut into the subtrees below its first one or two building
+    levels. Each worker process searches subtrees on its own copy of the
+    layout, starting from the optimizer's seed incumbent (if any), and all
+    workers share the incumbent score so they prune each other. Subtree
+    results are merged as they finish; ties go to the canonical order
+    (`CityOptimizer._improves`), so the answer matches serial mode.
+
+    `optimizer` must already be prepared for this run (`_prepare_run`).
+    While workers run, the parent publishes progress (nodes searched and
+    the best finished subtree so far) through the optimizer's check-ins
+    and incumbent callback, and if the
+    optimizer is cancelled it stops the workers and raises SearchCancelled.
+
+    Returns (best_score, best_arrangement, pruned_nodes).
+    """
+    from backend.optimizer import SearchCancelled
+
+    workers = max(1, min(workers, os.cpu_count() or 1))
+    depth = choose_split_depth(optimizer, buildings, workers)
+    prefixes = enumerate_subproblems(optimizer, buildings, yield_priorities, depth)
+
+    context = pool_context()
+    shared_best = context.Value('d', optimizer.best_score)
+    stop = context.Event()
+    seed = (optimizer.best_score, optimizer.best_arrangement, optimizer._best_keys)
+    initargs = (
+        shared_best, stop, optimizer.city, optimizer._table,
+        buildings, yield_priorities, optimizer.prune, optimizer._tile_masks, depth, seed
+    )
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=initargs) as pool:
+        futures = [pool.submit(_solve_subproblem, prefix) for prefix in prefixes]
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=CHECK_INTERVAL)
+            for future in done:
+                score, arrangement, keys, pruned, nodes = future.result()
+                optimizer.nodes_explored += nodes
+                optimizer.pruned_nodes += pruned
+                # Finished subtrees are the parent's incumbents (in completion order)
+                if optimizer._improves(score, keys):
+                    optimizer.best_score, optimizer.best_arrangement, optimizer._best_keys = score, arrangement, keys
+                    optimizer._new_incumbent()
+            try:
+                optimizer._check_in()
+            except SearchCancelled:
+                stop.set()
+                for future in pending:
+                    future.cancel()
+                raise
+
+    return optimizer.best_score, optimizer.best_arrangement, optimizer.pruned_nodes
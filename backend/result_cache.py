@@ -0,0 +1,369 @@
+# result_cache.py
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+from backend.city_layout import CityLayout
+from backend.optimizer import CityOptimizer, OptimizationResult
+from backend.singleflight import Singleflight
+from backend.yield_vector import YIELD_ORDER, YieldVector
+
+CACHE_FORMAT = 4  # bump when the key encoding or stored entries change shape
+
+def normalize_priorities(priorities: Dict[str, float]) -> Tuple[float, ...]:
+    """
+    Priorities along YIELD_ORDER, scaled so the largest magnitude is 1.
+    Scaling every weight by the same positive factor scales every score
+    the same way, so the best arrangement does not change.
+    """
+    weights = YieldVector.from_dict(priorities).values
+    scale = max((abs(w) for w in weights), default=0.0)
+    if scale:
+        weights = [w / scale for w in weights]
+    return tuple(round(w, 12) + 0.0 for w in weights)
+
+def normalize_options(strategy: str, time_budget_ms: float, seed: Optional[int]) -> Tuple:
+    """
+    Engine options that can change the answer. Worker counts never do, and
+    the exact search ignores the budget and seed.
+    """
+    if strategy == "backtracking":
+        return (strategy,)
+    return (strategy, float(time_budget_ms), seed)
+
+def layout_encoding(city: CityLayout, symmetry: Optional[Tuple[int, ...]] = None) -> List:
+    """
+    Terrain, features, fresh water, existing buildings and whether it is a
+    reserved city center, for every tile in tile order, after moving tile t
+    to `symmetry[t]` (a permutation from `city.topology.symmetries`) if given.
+    """
+    reserved = city.bitboard.reserved
+    tiles = [
+        [tile.terrain_type, sorted(tile.features), bool(tile.has_fresh_water), sorted(tile.buildings),
+         bool(reserved >> t & 1)]
+        for t, tile in enumerate(city.tiles.values())
+    ]
+    if symmetry is not None:
+        moved = [None] * len(tiles)
+        for t, target in enumerate(symmetry):
+            moved[target] = tiles[t]
+        tiles = moved
+    return [[city.radius, city.game_data.version], tiles]
+
+def canonical_symmetry(city: CityLayout) -> int:
+    """
+    Index into `city.topology.symmetries` of the rotation/reflection that
+    takes the layout to its canonical orientation: the one with the
+    smallest encoding. Layouts that are rotations or mirror images of each
+    other have the same canonical form, and since yields only depend on a
+    tile and its neighbours (and the center is fixed), their optimal
+    arrangements are the same up to that symmetry.
+    """
+    encodings = [
+        json.dumps(layout_encoding(city, symmetry), separators=(",", ":"))
+        for symmetry in city.topology.symmetries
+    ]
+    return min(range(len(encodings)), key=encodings.__getitem__)
+
+def request_key(
+    city: CityLayout,
+    buildings: List[str],
+    priorities: Dict[str, float],
+    options: Tuple,
+    symmetry: Optional[int] = None
+) -> str:
+    """
+    Hash of a canonical encoding of an optimize request. The layout is
+    taken in its canonical orientation (or under symmetry index `symmetry`
+    if given), and building order and priority scale do not matter, so
+    rotated, mirrored, reordered or rescaled requests share an entry.
+    """
+    if symmetry is None:
+        symmetry = canonical_symmetry(city)
+    canonical = [
+        CACHE_FORMAT,
+        layout_encoding(city, city.topology.symmetries[symmetry]),
+        sorted(buildings),
+        list(normalize_priorities(priorities)),
+        list(options),
+    ]
+    source = json.dumps(canonical, separators=(",", ":"))
+    return hashlib.sha256(source.encode()).hexdigest()
+
+class ResultCache:
+    """
+    LRU cache of optimize results keyed by `request_key`.
+
+    Entries are stored as encoded JSON bytes and the memory tier is capped
+    by their total size, evicting least recently used entries first. With
+    a `disk_dir`, every entry is also written there, so results survive a
+    restart; a memory miss that hits on disk is promoted back into memory.
+    The disk tier is capped at `max_disk_bytes`: once writes push it over,
+    the least recently used files (by mtime, which disk hits refresh) are
+    deleted down to three quarters of the cap. Processes sharing the
+    directory each prune it, so the cap holds host-wide up to the writes
+    made since the last prune. Safe to share between request threads.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        disk_dir: Optional[Path] = None,
+        max_disk_bytes: int = 256 * 1024 * 1024
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir is not None else None
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        # Size of the disk tier as of the last scan plus our writes since;
+        # None until the first write scans it
+        self._disk_bytes: Optional[int] = None
+        self._lock = Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[Any]:
+        """The entry for `key`, or None. Pass count_miss=False when re-checking a known miss."""
+        with self._lock:
+            raw = self._entries.get(key)
+            if raw is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(raw)
+
+        raw = self._read_disk(key)
+        with self._lock:
+            if raw is None:
+                self.misses += count_miss
+                return None
+            self.disk_hits += 1
+            self._store(key, raw)
+        return json.loads(raw)
+
+    def put(self, key: str, value: Any):
+        raw = json.dumps(value, separators=(",", ":")).encode()
+        with self._lock:
+            self._store(key, raw)
+        self._write_disk(key, raw)
+
+    def clear(self):
+        """Drop the memory tier (the disk tier is kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _store(self, key: str, raw: bytes):
+        if len(raw) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = raw
+        self._bytes += len(raw)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            raw = path.read_bytes()
+        except OSError:
+            return None
+        try:
+            # Recently read entries are the last to be pruned
+            os.utime(path)
+        except OSError:
+            pass
+        return raw
+
+    def _write_disk(self, key: str, raw: bytes):
+        """Write atomically; failures only cost the disk tier."""
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(raw)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += len(raw)
+            over = self._disk_bytes > self.max_disk_bytes
+        if over:
+            self._prune_disk()
+
+    def _disk_files(self) -> List[Tuple[float, int, Path]]:
+        """(mtime, size, path) of every disk entry; files that vanish meanwhile are skipped."""
+        files = []
+        for path in self.disk_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _prune_disk(self):
+        """Delete least recently used disk entries down to 3/4 of max_disk_bytes."""
+        files = sorted(self._disk_files(), key=lambda f: f[0])
+        total = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * 3 // 4
+        removed = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass  # another process pruned it first
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+            self.disk_evictions += removed
+
+def cached_optimize(
+    cache: ResultCache,
+    city: CityLayout,
+    buildings: List[str],
+    priorities: Dict[str, float],
+    strategy: str = "backtracking",
+    time_budget_ms: float = 1000,
+    seed: Optional[int] = None,
+    workers: int = 1,
+    optimizer: Optional[CityOptimizer] = None,
+    flight: Optional[Singleflight] = None
+) -> Tuple[List[OptimizationResult], int, bool]:
+    """
+    `optimize_multiple_buildings` through `cache`. Returns (results,
+    pruned_nodes, cache hit). With `flight`, concurrent misses on the same
+    key share one search, and a caller that gets another's result counts
+    as a hit.
+
+    Entries hold placements and yields, which do not depend on priority
+    scale, so scores are recomputed for the caller's priorities and
+    results follow the caller's building order. Positions are stored in
+    the layout's canonical orientation and mapped back to the caller's.
+    When several arrangements tie, a hit returns the one found for the
+    first request.
+
+    Local search without a `seed` gives a different answer every run, so
+    it is never cached: it just runs and reports a miss. The search (and
+    with it the optimizer's yield table) only starts on a miss.
+    """
+    if priorities is None:
+        priorities = {y: 1.0 for y in YIELD_ORDER}
+
+    def run() -> Tuple[List[OptimizationResult], int]:
+        search_optimizer = optimizer or CityOptimizer(city)
+        results = search_optimizer.optimize_multiple_buildings(
+            buildings,
+            priorities,
+            strategy=strategy,
+            time_budget_ms=time_budget_ms,
+            seed=seed,
+            workers=workers
+        )
+        return results, search_optimizer.pruned_nodes
+
+    if strategy != "backtracking" and seed is None:
+        results, pruned_nodes = run()
+        return results, pruned_nodes, False
+
+    options = normalize_options(strategy, time_budget_ms, seed)
+    topology = city.topology
+    g = canonical_symmetry(city)
+    symmetry = topology.symmetries[g]
+    inverse = [0] * len(symmetry)
+    for t, target in enumerate(symmetry):
+        inverse[target] = t
+    key = request_key(city, buildings, priorities, options, g)
+    entry = cache.get(key)
+    hit = entry is not None
+    if not hit:
+        def search() -> Tuple[Dict, bool]:
+            """The entry, and whether it came from the cache after all."""
+            if flight is not None:
+                # Another process on the host may have finished it while we waited
+                found = cache.get(key, count_miss=False)
+                if found is not None:
+                    return found, True
+            results, pruned_nodes = run()
+            found = {
+                "placements": [
+                    [r.building, list(topology.positions[symmetry[topology.index[r.position]]]), r.yields]
+                    for r in results
+                ],
+                "pruned_nodes": pruned_nodes,
+            }
+            cache.put(key, found)
+            return found, False
+
+        if flight is None:
+            entry, hit = search()
+        else:
+            (entry, hit), shared = flight.do(key, search)
+            hit = hit or shared
+
+    placements = [
+        [building, topology.positions[inverse[topology.index[tuple(position)]]], yields]
+        for building, position, yields in entry["placements"]
+    ]
+    return _results_for(placements, buildings, priorities), entry["pruned_nodes"], hit
+
+def _results_for(placements: List, buildings: List[str], priorities: Dict[str, float]) -> List[OptimizationResult]:
+    """Stored placements as results in `buildings` order, scored with `priorities`."""
+    weights = YieldVector.from_dict(priorities)
+    unused: Dict[str, List] = {}
+    for building, position, yields in placements:
+        unused.setdefault(building, []).append((tuple(position), yields))
+
+    results = []
+    for building in buildings:
+        if unused.get(building):
+            position, yields = unused[building].pop(0)
+            results.append(OptimizationResult(
+                position=position,
+                building=building,
+                yields=yields,
+                score=YieldVector.from_dict(yields["total_yields"]).dot(weights)
+            ))
+    return results
@@ -0,0 +1,103 @@
+# singleflight.py
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Event, Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: coalesce within the process only
+    fcntl = None
+
+class _Call:
+    """One in-flight computation and the callers waiting on it."""
+
+    def __init__(self):
+        self.done = Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+class Singleflight:
+    """
+    Collapses concurrent calls with the same key into one computation.
+
+    Within a process, the first caller of `do(key, fn)` runs `fn` and every
+    caller that arrives with the same key while it runs waits and receives
+    its value (or its exception). With a `lock_dir`, the leader also holds
+    an exclusive lock on `lock_dir/<key>.lock` while it runs, so identical
+    calls in other processes on the host (gunicorn workers) wait for it
+    instead of computing alongside it. Passing the value across processes
+    is up to `fn`: it should check a shared store (such as ResultCache's
+    disk tier) before computing. The leader deletes its lock file before
+    releasing it; a process that locked the file meanwhile notices the
+    file is gone and locks the new one, so lock files do not pile up.
+    """
+
+    def __init__(self, lock_dir: Optional[Path] = None):
+        self.lock_dir = Path(lock_dir) if lock_dir is not None and fcntl is not None else None
+        self._calls: Dict[str, _Call] = {}
+        self._lock = Lock()
+        self.leaders = 0
+        self.shared = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"leaders": self.leaders, "shared": self.shared, "in_flight": len(self._calls)}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Returns (value, shared): shared is True if another caller's run produced it."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            with self._host_lock(key):
+                call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    @contextmanager
+    def _host_lock(self, key: str):
+        if self.lock_dir is None:
+            yield
+            return
+        path = self.lock_dir / key[:2] / f"{key}.lock"
+        while True:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a+b") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                # The previous holder may have deleted the file while we
+                # waited; then lock whatever is at `path` now
+                if _is_linked(path, f):
+                    try:
+                        yield
+                    finally:
+                        # Still locked, so nobody can be holding the old file
+                        path.unlink()
+                    return
+
+def _is_linked(path: Path, f) -> bool:
+    """True if the open file `f` is still the file at `path`."""
+    try:
+        return os.path.samestat(os.stat(path), os.fstat(f.fileno()))
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,218 @@
+# tile_store.py
+
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+class Codebook:
+    """
+    Process-wide interning of names (terrain types, features, buildings) to
+    small integer codes. Codes are only meaningful inside one process;
+    TileStore pickles carry names and are re-coded on load.
+    """
+
+    def __init__(self, reserved: Iterable[str] = (), limit: Optional[int] = None):
+        self.names: List[str] = list(reserved)
+        self.codes: Dict[str, int] = {name: k for k, name in enumerate(self.names)}
+        self.limit = limit
+        self._lock = Lock()
+
+    def code(self, name: str) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            with self._lock:
+                code = self.codes.get(name)
+                if code is None:
+                    if self.limit is not None and len(self.names) >= self.limit:
+                        raise ValueError(f"Too many distinct names (limit {self.limit}): {name}")
+                    code = len(self.names)
+                    self.names.append(name)
+                    self.codes[name] = code
+        return code
+
+# Terrain code 0 is "no terrain set"
+TERRAIN_CODES = Codebook(reserved=("",))
+# Features are stored as a 64-bit set per tile
+FEATURE_CODES = Codebook(limit=64)
+BUILDING_CODES = Codebook()
+
+EMPTY_SLOT = -1
+
+class TileStore:
+    """
+    Struct-of-arrays storage for a layout's tiles, indexed by tile number
+    (the layout's tile order):
+      - features:    (tiles,) uint64 bitset of FEATURE_CODES
+      - buildings:   (tiles * SLOTS,) int32 BUILDING_CODES, EMPTY_SLOT if
+                     free; tile t uses entries t*SLOTS .. t*SLOTS + SLOTS-1
+      - terrain:     (tiles,) int16 TERRAIN_CODES
+      - fresh_water: (tiles,) bool
+
+    All columns are typed memoryviews into one bytearray, so copying a
+    store is a single buffer copy and reading one entry is as cheap as a
+    list lookup. `arrays()` gives numpy views of the same memory for bulk
+    work.
+    """
+
+    SLOTS = 2
+    # Bytes per tile: 8 (features) + 4 * SLOTS (buildings) + 2 (terrain) + 1 (fresh water)
+    TILE_BYTES = 8 + 4 * SLOTS + 2 + 1
+
+    def __init__(self, n_tiles: int, buffer: Optional[bytearray] = None):
+        self.n_tiles = n_tiles
+        if buffer is None:
+            buffer = bytearray(self.TILE_BYTES * n_tiles)
+            # All bits set is -1 == EMPTY_SLOT in every building entry
+            start, end = self._span("buildings")
+            buffer[start:end] = b"\xff" * (end - start)
+        self._buffer = buffer
+        self._bind()
+
+    def _span(self, column: str) -> Tuple[int, int]:
+        """Byte range of a column. Wider columns come first so every view is aligned."""
+        n = self.n_tiles
+        offsets = {
+            "features": (0, 8 * n),
+            "buildings": (8 * n, (8 + 4 * self.SLOTS) * n),
+            "terrain": ((8 + 4 * self.SLOTS) * n, (10 + 4 * self.SLOTS) * n),
+            "fresh_water": ((10 + 4 * self.SLOTS) * n, self.TILE_BYTES * n),
+        }
+        return offsets[column]
+
+    def _bind(self):
+        view = memoryview(self._buffer)
+        for column, fmt in (("features", "Q"), ("buildings", "i"), ("terrain", "h"), ("fresh_water", "?")):
+            start, end = self._span(column)
+            setattr(self, column, view[start:end].cast(fmt))
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Writable numpy views of every column (buildings as (tiles, SLOTS))."""
+        dtypes = {"features": np.uint64, "buildings": np.int32, "terrain": np.int16, "fresh_water": np.bool_}
+        result = {}
+        for column, dtype in dtypes.items():
+            start, end = self._span(column)
+            result[column] = np.frombuffer(self._buffer, dtype=dtype, count=(end - start) // np.dtype(dtype).itemsize,
+                                           offset=start)
+        result["buildings"] = result["buildings"].reshape(self.n_tiles, self.SLOTS)
+        return result
+
+    def copy(self) -> "TileStore":
+        return TileStore(self.n_tiles, bytearray(self._buffer))
+
+    def static_bytes(self) -> bytes:
+        """Terrain, features and fresh water of every tile (no buildings), as bytes."""
+        features_end = self._span("features")[1]
+        terrain_start = self._span("terrain")[0]
+        return bytes(self._buffer[:features_end]) + bytes(self._buffer[terrain_start:])
+
+    # Terrain and features
+
+    def set_terrain(self, t: int, terrain_type: str, features: Iterable[str], has_fresh_water: bool):
+        bits = 0
+        for feature in features:
+            bits |= 1 << FEATURE_CODES.code(feature)
+        self.terrain[t] = TERRAIN_CODES.code(terrain_type or "")
+        self.features[t] = bits
+        self.fresh_water[t] = bool(has_fresh_water)
+
+    def terrain_name(self, t: int) -> str:
+        return TERRAIN_CODES.names[self.terrain[t]]
+
+    def feature_names(self, t: int) -> List[str]:
+        bits = self.features[t]
+        names = []
+        while bits:
+            low = bits & -bits
+            names.append(FEATURE_CODES.names[low.bit_length() - 1])
+            bits ^= low
+        return names
+
+    def has_fresh_water(self, t: int) -> bool:
+        return self.fresh_water[t]
+
+    # Buildings
+
+    def _slots(self, t: int) -> List[int]:
+        base = t * self.SLOTS
+        return self.buildings[base:base + self.SLOTS].tolist()
+
+    def building_names(self, t: int) -> List[str]:
+        names = BUILDING_CODES.names
+        return [names[code] for code in self._slots(t) if code != EMPTY_SLOT]
+
+    def building_count(self, t: int) -> int:
+        return self.SLOTS - self._slots(t).count(EMPTY_SLOT)
+
+    def count(self, t: int, building: str) -> int:
+        code = BUILDING_CODES.codes.get(building)
+        return 0 if code is None else self._slots(t).count(code)
+
+    def add_building(self, t: int, building: str) -> Tuple[int, int]:
+        """
+        Put `building` in the first free slot. Returns (copies of it that
+        were already on the tile, building count after).
+        """
+        code = BUILDING_CODES.code(building)
+        buildings = self.buildings
+        base = t * self.SLOTS
+        copies = 0
+        for k in range(self.SLOTS):
+            slot = buildings[base + k]
+            if slot == EMPTY_SLOT:
+                buildings[base + k] = code
+                return copies, k + 1
+            copies += slot == code
+        raise ValueError(f"Tile {t} has no free building slot")
+
+    def remove_building(self, t: int, building: str) -> Optional[Tuple[int, int]]:
+        """
+        Remove one copy of `building`, keeping the others in order. Returns
+        (copies of it left, building count after), or None if it was not there.
+        """
+        code = BUILDING_CODES.codes.get(building)
+        slots = self._slots(t)
+        if code is None or code not in slots:
+            return None
+        k = slots.index(code)
+        del slots[k]
+        slots.append(EMPTY_SLOT)
+        base = t * self.SLOTS
+        for j in range(k, self.SLOTS):
+            self.buildings[base + j] = slots[j]
+        return slots.count(code), self.SLOTS - slots.count(EMPTY_SLOT)
+
+    def clear_slot(self, t: int, k: int):
+        """Empty slot `k` of tile `t` directly (undoing an add into that slot)."""
+        self.buildings[t * self.SLOTS + k] = EMPTY_SLOT
+
+    # Pickling: codes are per process, so carry names and re-code on load
+
+    def __getstate__(self):
+        return {
+            "n_tiles": self.n_tiles,
+            "buffer": bytes(self._buffer),
+            "terrain_names": list(TERRAIN_CODES.names),
+            "feature_names": list(FEATURE_CODES.names),
+            "building_names": list(BUILDING_CODES.names),
+        }
+
+    def __setstate__(self, state):
+        self.n_tiles = state["n_tiles"]
+        self._buffer = bytearray(state["buffer"])
+        self._bind()
+        arrays = self.arrays()
+
+        terrain_map = np.array([TERRAIN_CODES.code(n) for n in state["terrain_names"]], dtype=np.int16)
+        arrays["terrain"][:] = terrain_map[arrays["terrain"]]
+
+        features = arrays["features"]
+        old_features = features.copy()
+        features.fill(0)
+        for bit, name in enumerate(state["feature_names"]):
+            has = (old_features >> np.uint64(bit)) & np.uint64(1)
+            features |= has << np.uint64(FEATURE_CODES.code(name))
+
+        building_map = np.array([BUILDING_CODES.code(n) for n in state["building_names"]] + [EMPTY_SLOT],
+                                dtype=np.int32)
+        # EMPTY_SLOT (-1) indexes the trailing entry, which maps it to itself
+        arrays["buildings"][:] = building_map[arrays["buildings"]]
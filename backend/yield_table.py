@@ -0,0 +1,113 @@
+# yield_table.py
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from backend.city_layout import CityLayout, YieldCalculator
+from backend.yield_vector import YieldVector
+
+class YieldTable:
+    """
+    Static yields for every (building, tile) pair of one layout.
+
+    Terrain adjacency depends only on terrain and features, never on placed
+    buildings, so it is computed once here instead of walking the JSON
+    `adjacency_rules` at every search node. Yields are stored along
+    YieldCalculator.YIELD_ORDER:
+      - static:  (buildings, tiles, yields) base + adjacency yields
+      - quarter: (buildings, yields) the building's own quarter bonus, which
+                 it only gets while sharing its tile with a differently named
+                 building, so it is kept apart from `static`
+      - valid:   (buildings, tiles) placement requirements met (occupancy ignored),
+                 also kept as one bitboard mask per building in `valid_masks`
+
+    Priorities only enter as a weight vector, so re-scoring the same table
+    for new priorities is a single matrix-vector product. Arrays are made
+    read-only because tables are shared through `get_yield_table`.
+    """
+
+    def __init__(self, city: CityLayout, buildings: Optional[Iterable[str]] = None):
+        names = city.building_data if buildings is None else buildings
+        # Deduplicate while keeping order; unknown buildings have no row
+        self.buildings: List[str] = [b for b in dict.fromkeys(names) if b in city.building_data]
+        self.positions: List[Tuple[int, int]] = list(city.tiles)
+        self.yield_types: Tuple[str, ...] = YieldCalculator.YIELD_ORDER
+
+        self.building_index: Dict[str, int] = {b: k for k, b in enumerate(self.buildings)}
+        self.position_index: Dict[Tuple[int, int], int] = {p: k for k, p in enumerate(self.positions)}
+
+        n_b, n_t, n_y = len(self.buildings), len(self.positions), len(self.yield_types)
+        self.static = np.zeros((n_b, n_t, n_y))
+        self.quarter = np.zeros((n_b, n_y))
+        self.valid = np.zeros((n_b, n_t), dtype=bool)
+        self.valid_masks: List[int] = []
+
+        for b, building in enumerate(self.buildings):
+            building_info = city.building_data[building]
+            base = self._to_row(building_info.get('yields', {}))
+            self.quarter[b] = self._to_row(building_info.get('quarter_bonuses', {}))
+            mask = city.bitboard.placement_mask(building_info.get('placement_requirements', {}))
+            self.valid_masks.append(mask)
+            self.static[b] = base + city.adjacency_array(building)
+            self.valid[b] = city.bitboard.to_array(mask)
+
+        for arr in (self.static, self.quarter, self.valid):
+            arr.flags.writeable = False
+
+    def _to_row(self, yields: Dict[str, float]) -> np.ndarray:
+        """Yield dict -> vector along `yield_types` (unknown yield types are dropped)."""
+        return np.array(YieldVector.from_dict(yields).values)
+
+    def covers(self, buildings: Iterable[str], city: CityLayout) -> bool:
+        """True if every known building in `buildings` has a row in this table."""
+        return all(b in self.building_index for b in buildings if b in city.building_data)
+
+    def static_scores(self, priorities: Dict[str, float]) -> np.ndarray:
+        """(buildings, tiles) weighted score of base + adjacency yields."""
+        return self.static @ self._to_row(priorities)
+
+    def quarter_scores(self, priorities: Dict[str, float]) -> np.ndarray:
+        """(buildings,) weighted value of the quarter bonus each building grants."""
+        return self.quarter @ self._to_row(priorities)
+
+
+# Compiled all-building tables, keyed by game data version and
+# CityLayout.terrain_signature()
+_TABLE_CACHE: "OrderedDict[Tuple, YieldTable]" = OrderedDict()
+_TABLE_CACHE_SIZE = 64
+_TABLE_CACHE_LOCK = Lock()
+# Largest grid that gets a shared all-building table (radius 6 is 127 tiles)
+SHARED_TABLE_MAX_RADIUS = 6
+
+def get_yield_table(city: CityLayout) -> YieldTable:
+    """
+    Return the shared YieldTable (all buildings) for this layout's terrain,
+    compiling it on first use. Requests that only change priorities reuse
+    the cached table and just re-weight it.
+    """
+    key = (city.game_data.version, city.terrain_signature())
+    with _TABLE_CACHE_LOCK:
+        table = _TABLE_CACHE.get(key)
+        if table is not None:
+            _TABLE_CACHE.move_to_end(key)
+            return table
+
+    table = YieldTable(city)
+    with _TABLE_CACHE_LOCK:
+        _TABLE_CACHE[key] = table
+        _TABLE_CACHE.move_to_end(key)
+        while len(_TABLE_CACHE) > _TABLE_CACHE_SIZE:
+            _TABLE_CACHE.popitem(last=False)
+    return table
+
+def table_for(city: CityLayout, buildings: Iterable[str]) -> YieldTable:
+    """
+    A YieldTable covering `buildings` on this layout: the shared all-building
+    table for city-sized grids, or a private table of just `buildings` for
+    region boards, where compiling (and caching) every building for every
+    tile costs far more than the search needs.
+    """
+    if city.radius <= SHARED_TABLE_MAX_RADIUS:
+        return get_yield_table(city)
+    return YieldTable(city, buildings)
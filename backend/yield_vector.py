@@ -0,0 +1,127 @@
+# yield_vector.py
+
+from typing import Dict, Iterable, Iterator, Mapping, NamedTuple, Optional, Tuple, Union
+
+# The fixed order of yield types in every vector, YieldTable column and
+# compiled adjacency program
+YIELD_ORDER: Tuple[str, ...] = ("food", "production", "gold", "science", "culture", "happiness", "influence")
+YIELD_INDEX: Dict[str, int] = {y: k for k, y in enumerate(YIELD_ORDER)}
+
+class YieldVector:
+    """
+    Yields (or priority weights) as a list of floats along YIELD_ORDER.
+
+    Arithmetic works in place (`+=`, `-=`, `*=`), so scoring code can keep
+    one vector per result instead of building a dict per step. Dicts only
+    appear at the API boundary, through `from_dict` and `to_dict`.
+    """
+
+    __slots__ = ("values",)
+
+    def __init__(self, values: Optional[Iterable[float]] = None):
+        if values is None:
+            self.values = [0.0] * len(YIELD_ORDER)
+        else:
+            self.values = [float(v) for v in values]
+            if len(self.values) != len(YIELD_ORDER):
+                raise ValueError(f"Expected {len(YIELD_ORDER)} yields, got {len(self.values)}")
+
+    @classmethod
+    def from_dict(cls, yields: Mapping[str, float]) -> "YieldVector":
+        """Yield dict -> vector. Keys that are not yield types are dropped."""
+        vector = cls()
+        for name, value in yields.items():
+            k = YIELD_INDEX.get(name)
+            if k is not None:
+                vector.values[k] += float(value)
+        return vector
+
+    def to_dict(self) -> Dict[str, float]:
+        return dict(zip(YIELD_ORDER, self.values))
+
+    def copy(self) -> "YieldVector":
+        vector = YieldVector.__new__(YieldVector)
+        vector.values = self.values.copy()
+        return vector
+
+    def dot(self, weights: Union["YieldVector", Iterable[float]]) -> float:
+        """Weighted sum against a priority vector."""
+        other = weights.values if isinstance(weights, YieldVector) else weights
+        return sum(a * b for a, b in zip(self.values, other))
+
+    def __getitem__(self, key: Union[str, int]) -> float:
+        return self.values[YIELD_INDEX[key] if isinstance(key, str) else key]
+
+    def __setitem__(self, key: Union[str, int], value: float):
+        self.values[YIELD_INDEX[key] if isinstance(key, str) else key] = float(value)
+
+    def __iadd__(self, other: Union["YieldVector", Iterable[float]]) -> "YieldVector":
+        other = other.values if isinstance(other, YieldVector) else other
+        values = self.values
+        for k, v in enumerate(other):
+            values[k] += v
+        return self
+
+    def __isub__(self, other: Union["YieldVector", Iterable[float]]) -> "YieldVector":
+        other = other.values if isinstance(other, YieldVector) else other
+        values = self.values
+        for k, v in enumerate(other):
+            values[k] -= v
+        return self
+
+    def __imul__(self, factor: float) -> "YieldVector":
+        values = self.values
+        for k in range(len(values)):
+            values[k] *= factor
+        return self
+
+    def __add__(self, other):
+        result = self.copy()
+        result += other
+        return result
+
+    def __sub__(self, other):
+        result = self.copy()
+        result -= other
+        return result
+
+    def __mul__(self, factor: float):
+        result = self.copy()
+        result *= factor
+        return result
+
+    __rmul__ = __mul__
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.values)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, YieldVector):
+            return self.values == other.values
+        return NotImplemented
+
+    # Mutable, so not hashable
+    __hash__ = None
+
+    def __repr__(self):
+        nonzero = ", ".join(f"{y}={v:g}" for y, v in zip(YIELD_ORDER, self.values) if v)
+        return f"YieldVector({nonzero})"
+
+class BuildingYields(NamedTuple):
+    """The yield breakdown of one building on one tile, as vectors."""
+    base: YieldVector
+    adjacency: YieldVector
+    quarter: YieldVector
+    total: YieldVector
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """The nested dict format of CityLayout.calculate_building_yields."""
+        return {
+            "base_yields": self.base.to_dict(),
+            "adjacency_yields": self.adjacency.to_dict(),
+            "quarter_yields": self.quarter.to_dict(),
+            "total_yields": self.total.to_dict()
+        }
@@ -1,6 +1,7 @@
 import math
 import json
 from flask import Flask, render_template_string
+from backend.hex_topology import ring_to_cube
 
 ###############################################################################
 # 1) Adjustable layout variables
@@ -22,36 +23,11 @@ def ring_center(r, i):
     - r = ring # (0..3)
     - i = tile index within ring (0..6*r-1)
     
-    Uses axial coordinates with conversion to cartesian for rendering.
+    Uses the cube coordinates from backend.hex_topology with conversion
+    to cartesian for rendering.
     """
-    if r == 0:
-        # Center tile at (0,0)
-        return (0.0, 0.0)
-
-    # Determine which of the 6 sides this index falls on and position along that side
-    side = i // r
-    pos = i % r
-    
-    # Starting coordinates for each side
-    # Using cube coordinates (q, r, s) where q + r + s = 0
-    if side == 0:
-        # Top-right edge
-        q, r, s = r, -pos, -r+pos
-    elif side == 1:
-        # Right edge
-        q, r, s = r-pos, -r, pos
-    elif side == 2:
-        # Bottom-right edge
-        q, r, s = -pos, -r+pos, r
-    elif side == 3:
-        # Bottom-left edge
-        q, r, s = -r, pos, r-pos
-    elif side == 4:
-        # Left edge
-        q, r, s = -r+pos, r, -pos
-    else:  # side == 5
-        # Top-left edge
-        q, r, s = pos, r-pos, -r
+    # Cube coordinates (q, r, s) where q + r + s = 0, shared with the backend
+    q, r, s = ring_to_cube(r, i)
     
     # Convert axial to cartesian coordinates for rendering
     # For pointy-top hexagons:
@@ -0,0 +1,37 @@
+import pytest
+from backend.city_layout import CityLayout, YieldCalculator
+from backend.adjacency_rules import compile_adjacency_rules, compile_rule
+
+def test_compile_rule_resolves_aliases_and_bonus_columns():
+    """Aliases expand to terrain types and bonuses become yield columns."""
+    rule = compile_rule(
+        {"sources": ["coastal_tile", "resource"], "bonus_yields": {"gold": 1, "food": 0}},
+        YieldCalculator.YIELD_ORDER
+    )
+    assert {"coast", "navigable_river", "coastal_lake", "resource"} <= rule.terrains
+    assert "resource" in rule.features
+    assert rule.bonus == ((YieldCalculator.YIELD_ORDER.index("gold"), 1.0),)
+
+def test_compile_rule_rejects_unknown_yield():
+    """A misspelt yield type fails at compile time, not mid-search."""
+    with pytest.raises(ValueError):
+        compile_rule({"sources": ["mountain"], "bonus_yields": {"sciense": 1}}, YieldCalculator.YIELD_ORDER)
+
+def test_program_masks_follow_terrain_edits():
+    """Cached source masks are rebuilt after the terrain changes."""
+    city = CityLayout()
+    programs = compile_adjacency_rules(
+        {"test": {"adjacency_rules": [{"sources": ["mountain"], "bonus_yields": {"science": 2}}]}},
+        YieldCalculator.YIELD_ORDER
+    )
+    program = programs["test"]
+    science = YieldCalculator.YIELD_ORDER.index("science")
+    t = city.bitboard.bit_index[(0, 0)]
+
+    assert program.evaluate(city.bitboard, t)[science] == 0.0
+    city.set_tile_terrain(0, 0, "mountain", [], False)
+    assert program.evaluate(city.bitboard, t)[science] == 2.0
+    for ring, index in city.get_adjacent_positions(0, 0):
+        city.set_tile_terrain(ring, index, "plains_flat", ["mountain"], False)
+    expected = 2.0 * (1 + len(city.get_adjacent_positions(0, 0)))
+    assert program.evaluate(city.bitboard, t)[science] == expected
@@ -0,0 +1,83 @@
+import json
+import os
+import pytest
+
+HEXES = {
+    "(0,0)": "#9E9136",  # plains_flat
+    "(1,0)": "#66B3FF",  # coast
+    "(1,1)": "#003366",  # mountain
+    "(1,2)": "#9E9136",
+    "(1,3)": "#9E9136",
+    "(1,4)": "#66B3FF",
+}
+
+@pytest.fixture(scope="module")
+def app_module(tmp_path_factory):
+    # Importing the app creates its log file and layout folder in the working directory
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    return app
+
+@pytest.fixture
+def client(app_module):
+    # Every test searches: nothing is answered from an earlier test's cache
+    app_module.result_cache.clear()
+    return app_module.app.test_client()
+
+def parse_events(text):
+    """Server-sent events as (event, data) pairs"""
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def test_optimize_stream_reports_incumbents_and_result(client):
+    """Incumbent scores match their per-building results, and the stream ends with /api/optimize's answer"""
+    body = {
+        "hexes": HEXES,
+        "buildings": ["market", "bank", "arena", "library"],
+        "priorities": {"gold": 1.0, "happiness": 1.0, "science": 1.0},
+    }
+    response = client.post("/api/optimize_stream", json=body)
+    assert response.mimetype == "text/event-stream"
+    events = parse_events(response.get_data(as_text=True))
+
+    names = [event for event, _ in events]
+    assert names[0] == "job" and names[-1] == "done"
+    assert "incumbent" in names
+    incumbents = [data for event, data in events if event == "incumbent"]
+    for incumbent in incumbents:
+        # Quarter bonuses between the incumbent's own buildings are included
+        assert sum(r["score"] for r in incumbent["results"]) == pytest.approx(incumbent["score"])
+
+    done = events[-1][1]
+    assert not done["cached"]
+    assert sum(r["score"] for r in done["results"]) == pytest.approx(incumbents[-1]["score"])
+    assert any(any(r["yields"]["quarter_yields"].values()) for r in done["results"])
+
+    direct = client.post("/api/optimize", json=body).get_json()
+    assert direct["cached"]
+    assert direct["results"] == done["results"]
+
+def test_disconnecting_cancels_the_stream_job(client, app_module):
+    """Closing the stream stops a search nobody is watching"""
+    body = {
+        "hexes": HEXES,
+        "buildings": ["market", "bank", "arena", "library"],
+        "strategy": "local_search",
+        "time_budget_ms": 60000,
+    }
+    response = client.post("/api/optimize_stream", json=body, buffered=False)
+    chunks = iter(response.response)
+    event, data = parse_events(next(chunks).decode())[0]
+    assert event == "job"
+
+    response.close()
+    job = app_module.job_queue.get(data["job_id"])
+    assert job.wait(10)
+    assert job.status == "cancelled"
@@ -0,0 +1,117 @@
+from backend.city_layout import CityLayout
+from backend.bitboard import iter_bits, popcount
+
+def test_terrain_masks_follow_set_tile_terrain():
+    """Terrain, feature and fresh water masks track tile edits."""
+    city = CityLayout()
+    board = city.bitboard
+    bit = 1 << board.bit_index[(1, 0)]
+
+    city.set_tile_terrain(1, 0, "plains_flat", ["forest"], True)
+    assert board.terrain["plains_flat"] & bit
+    assert board.features["forest"] & bit
+    assert board.fresh_water & bit
+
+    city.set_tile_terrain(1, 0, "coast", [], False)
+    assert "plains_flat" not in board.terrain
+    assert "forest" not in board.features
+    assert board.terrain["coast"] & bit
+    assert not board.fresh_water & bit
+
+def test_occupancy_masks_follow_buildings():
+    """Occupied/full masks track add_building and remove_building."""
+    city = CityLayout()
+    city.set_tile_terrain(1, 0, "coast", [], True)
+    board = city.bitboard
+    bit = 1 << board.bit_index[(1, 0)]
+
+    assert city.add_building(1, 0, "market")
+    assert board.occupied & bit and not board.full & bit
+    assert city.add_building(1, 0, "bank")
+    assert board.full & bit
+    assert not city.is_valid_building_location(1, 0, "library")
+
+    city.remove_building(1, 0, "bank")
+    assert board.occupied & bit and not board.full & bit
+    city.remove_building(1, 0, "market")
+    assert not board.occupied & bit
+
+def test_source_masks_and_match_count():
+    """Aliased sources expand to their terrains and counts cover the tile itself."""
+    city = CityLayout()
+    board = city.bitboard
+    city.set_tile_terrain(0, 0, "coast", [], False)
+    center = board.bit_index[(0, 0)]
+    neighbours = list(iter_bits(board.closed_neighbourhood(center) & ~(1 << center)))
+    first = board.positions[neighbours[0]]
+    city.set_tile_terrain(first[0], first[1], "navigable_river", [], True)
+
+    coastal = board.source_mask("coastal_tile")
+    assert popcount(coastal) == 2
+    assert board.match_count((0, 0), coastal) == 2
+    assert board.sources_mask(["coast", "navigable_river"]) == coastal
+
+def test_placement_mask_matches_requirements():
+    """placement_mask agrees with checking each tile's terrain and features."""
+    city = CityLayout()
+    for i, terrain in enumerate(["coast", "plains_flat", "grassland_flat", "desert_hill"]):
+        city.set_tile_terrain(1, i, terrain, ["forest"] if i % 2 else [], False)
+
+    requirements = [info.get('placement_requirements', {}) for info in city.building_data.values()]
+    requirements.append({'tile_type': ["plains_flat", "coast"], 'features': ["forest"]})
+    for reqs in requirements:
+        mask = city.bitboard.placement_mask(reqs)
+        for pos, t in city.bitboard.bit_index.items():
+            tile = city.tiles[pos]
+            expected = bool(tile.terrain_type)
+            if 'tile_type' in reqs:
+                expected = expected and tile.terrain_type in reqs['tile_type']
+            expected = expected and all(f in tile.features for f in reqs.get('features', []))
+            assert bool(mask >> t & 1) == expected
+
+def test_center_and_mountains_are_blocked():
+    """No building goes on the palace tile or on mountains."""
+    city = CityLayout()
+    city.set_tile_terrain(0, 0, "plains_flat", [], False)
+    city.set_tile_terrain(1, 0, "mountain", [], False)
+    city.set_tile_terrain(1, 1, "grassland_mountainous", [], False)
+    city.set_tile_terrain(1, 2, "plains_flat", ["mountain"], False)
+    city.set_tile_terrain(1, 3, "plains_flat", [], False)
+    for pos in [(0, 0), (1, 0), (1, 1), (1, 2)]:
+        assert not city.is_valid_building_location(*pos, "market")
+    assert city.is_valid_building_location(1, 3, "market")
+
+def test_blocked_terrain_comes_from_the_terrain_data():
+    """Unbuildable land in terrain.json is blocked; water is left to tile_type."""
+    from backend.game_data import GameData
+
+    data = GameData(
+        {"hut": {"yields": {"food": 1}}},
+        terrain={"lava": {"is_buildable": False}, "lake": {"is_buildable": False, "is_water": True}},
+    )
+    assert data.blocked_terrain == {"lava"}
+
+    city = CityLayout(data)
+    for pos, terrain in [((1, 0), "lava"), ((1, 1), "lake"), ((1, 2), "mountain")]:
+        city.set_tile_terrain(*pos, terrain, [], False)
+    assert not city.is_valid_building_location(1, 0, "hut")
+    assert city.is_valid_building_location(1, 1, "hut")
+    assert city.is_valid_building_location(1, 2, "hut")
+
+def test_region_boards_reserve_only_named_centers():
+    """(0,0) is an ordinary tile on a region board unless it is a city center."""
+    single = CityLayout(radius=6)
+    single.set_tile_terrain(0, 0, "plains_flat", [], False)
+    assert not single.is_valid_building_location(0, 0, "library")
+
+    board = CityLayout(radius=6, reserved=[])
+    board.set_tile_terrain(0, 0, "plains_flat", [], False)
+    board.set_tile_terrain(3, 0, "plains_flat", [], False)
+    assert board.is_valid_building_location(0, 0, "library")
+
+    centered = CityLayout(radius=6, reserved=[(3, 0)])
+    centered.set_tile_terrain(0, 0, "plains_flat", [], False)
+    centered.set_tile_terrain(3, 0, "plains_flat", [], False)
+    assert centered.is_valid_building_location(0, 0, "library")
+    assert not centered.is_valid_building_location(3, 0, "library")
+    assert centered.terrain_signature() != board.terrain_signature()
@@ -85,4 +85,120 @@ def test_building_validation():
     city.set_tile_terrain(1, 0, "coast", [], True)
     # Try to place buildings
     assert city.is_valid_building_location(1, 0, "market") == True
-    assert city.is_valid_building_location(1, 0, "nonexistent_building") == False
\ No newline at end of file
+    assert city.is_valid_building_location(1, 0, "nonexistent_building") == False
+
+def test_zobrist_hash_tracks_placements():
+    """Test the incremental placement hash."""
+    city = CityLayout()
+    city.set_tile_terrain(1, 0, "coast", [], True)
+    city.set_tile_terrain(1, 1, "coast", [], True)
+    assert city.zobrist_hash == 0
+
+    city.add_building(1, 0, "market")
+    city.add_building(1, 1, "bank")
+    first = city.zobrist_hash
+    city.remove_building(1, 0, "market")
+    city.remove_building(1, 1, "bank")
+    assert city.zobrist_hash == 0
+
+    # Same placements in another order hash the same
+    city.add_building(1, 1, "bank")
+    city.add_building(1, 0, "market")
+    assert city.zobrist_hash == first
+
+    # Two copies on one tile must not cancel out
+    city.add_building(1, 0, "market")
+    assert city.zobrist_hash not in (0, first)
+
+def test_larger_radius_grid():
+    """Region-sized grids keep the same ring numbering and adjacency rules."""
+    city = CityLayout(radius=6)
+    assert len(city.tiles) == 1 + sum(6 * r for r in range(1, 7))
+    assert city.get_tile(6, 35) is not None
+    assert city.get_tile(7, 0) is None
+    assert len(city.get_adjacent_positions(5, 0)) == 6
+    assert len(city.get_adjacent_positions(6, 0)) == 3
+
+    city.set_tile_terrain(6, 0, "coast", [], True)
+    assert city.add_building(6, 0, "market")
+    assert city.calculate_building_yields(6, 0, "market")["total_yields"]["gold"] > 0
+
+def test_layout_radius_is_capped(tmp_path):
+    """Client layouts grow the grid only up to the storage's max_radius."""
+    from backend.layout_storage import LayoutStorage
+
+    storage = LayoutStorage(tmp_path, max_radius=5)
+    assert storage.create_city_layout({"(5,0)": "#1E90FF"}, reserved=[(0, 0)]).radius == 5
+    with pytest.raises(ValueError):
+        storage.create_city_layout({"(0,0)": "#1E90FF", "(100000,0)": "#1E90FF"}, reserved=[(0, 0)])
+
+def test_place_and_undo_restore_state():
+    """undo() takes placements back last-in first-out and restores the hash and masks."""
+    city = CityLayout()
+    city.set_tile_terrain(1, 0, "coast", [], True)
+    city.add_building(1, 0, "market")
+    board = city.bitboard
+    before = (city.zobrist_hash, board.occupied, board.full)
+
+    mark = city.savepoint()
+    assert city.place(1, 0, "bank")
+    assert city.get_tile(1, 0).buildings == ["market", "bank"]
+    assert board.full
+    assert not city.place(1, 0, "library")  # tile is full
+
+    assert city.undo()
+    assert city.get_tile(1, 0).buildings == ["market"]
+    assert (city.zobrist_hash, board.occupied, board.full) == before
+
+    city.place(1, 0, "bank")
+    city.place(0, 0, "library", validate=False)
+    city.rollback(mark)
+    assert city.get_tile(0, 0).buildings == [] and city.get_tile(1, 0).buildings == ["market"]
+    assert (city.zobrist_hash, board.occupied, board.full) == before
+    assert not city.undo()
+
+def test_untracked_edits_discard_the_trail():
+    city = CityLayout()
+    city.set_tile_terrain(1, 0, "coast", [], True)
+    city.place(1, 0, "market")
+    city.add_building(1, 0, "bank")
+    assert not city.undo()
+    assert city.get_tile(1, 0).buildings == ["market", "bank"]
+
+def test_yield_cache_follows_tile_versions():
+    """Cached yields are reused until the tile or its neighbourhood changes."""
+    city = CityLayout()
+    for i in range(6):
+        city.set_tile_terrain(1, i, "grassland_flat", [], False)
+    first = city.calculate_building_yields(1, 0, "library")
+    first["total_yields"]["science"] = -100  # callers get their own copy
+    assert city.calculate_building_yields(1, 0, "library")["total_yields"]["science"] != -100
+
+    # A distant edit keeps the entry; a neighbour's terrain edit replaces it
+    cached = city._yield_cache[(city.topology.index[(1, 0)], "library")]
+    city.set_tile_terrain(3, 9, "mountain", [], False)
+    city.calculate_building_yields(1, 0, "library")
+    assert city._yield_cache[(city.topology.index[(1, 0)], "library")] is cached
+
+    city.set_tile_terrain(0, 0, "mountain", [], False)
+    with_mountain = city.calculate_building_yields(1, 0, "library")
+    assert city._yield_cache[(city.topology.index[(1, 0)], "library")] is not cached
+    assert with_mountain == city._compute_building_yields(1, 0, "library").to_dict()
+
+def test_yield_cache_survives_place_and_undo():
+    city = CityLayout()
+    city.set_tile_terrain(1, 0, "grassland_flat", [], False)
+    alone = city.calculate_building_yields(1, 0, "library")
+
+    city.place(1, 0, "academy", validate=False)
+    paired = city.calculate_building_yields(1, 0, "library")
+    assert paired == city._compute_building_yields(1, 0, "library").to_dict()
+
+    # Buildings only change their own tile's version, so the
+    # neighbour's entry outlives the placement and the undo
+    neighbour = city.calculate_building_yields(0, 0, "library")
+    city.undo()
+    cached = city._yield_cache[(city.topology.index[(0, 0)], "library")]
+    assert city.calculate_building_yields(0, 0, "library") == neighbour
+    assert city._yield_cache[(city.topology.index[(0, 0)], "library")] is cached
+    assert city.calculate_building_yields(1, 0, "library") == alone
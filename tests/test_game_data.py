@@ -0,0 +1,80 @@
+import pickle
+import pytest
+from backend.city_layout import CityLayout
+from backend.game_data import GameData, get_game_data
+
+def test_layouts_share_one_registry():
+    """Every layout uses the same loaded and compiled rules."""
+    a, b = CityLayout(), CityLayout()
+    assert a.game_data is b.game_data is get_game_data()
+    assert a.building_data is get_game_data().buildings
+    assert set(a.adjacency_programs) == set(a.building_data)
+
+def test_game_data_is_read_only():
+    """Neither the registry nor the parsed JSON inside it can be changed."""
+    data = get_game_data()
+    name = next(iter(data.buildings))
+    with pytest.raises(TypeError):
+        data.buildings[name] = {}
+    with pytest.raises(TypeError):
+        data.buildings[name]['yields']['gold'] = 100
+    with pytest.raises(AttributeError):
+        data.version = "changed"
+
+def test_invalid_building_data_is_rejected():
+    """Bad yield names and malformed rules fail at load time."""
+    with pytest.raises(ValueError):
+        GameData({"bad": {"yields": {"sciense": 1}}})
+    with pytest.raises(ValueError):
+        GameData({"bad": {"adjacency_rules": [{"sources": "mountain"}]}})
+
+def test_injected_game_data_survives_pickling():
+    """Custom rules travel with a pickled layout; the shared ones are re-attached."""
+    custom = GameData({"hut": {"yields": {"food": 1}}}, version="custom")
+    city = pickle.loads(pickle.dumps(CityLayout(custom)))
+    assert city.game_data.version == "custom"
+    assert set(city.building_data) == {"hut"}
+
+    city = pickle.loads(pickle.dumps(CityLayout()))
+    assert city.game_data is get_game_data()
+
+def test_compiled_cache_rebuilds_when_sources_change(tmp_path):
+    """The binary cache is reused for the same JSON and replaced after an edit."""
+    import json
+    import shutil
+    from backend.game_data import DATA_DIR, DATA_FILES
+
+    data_dir, cache_dir = tmp_path / "data", tmp_path / "cache"
+    data_dir.mkdir()
+    for filename in DATA_FILES.values():
+        shutil.copy(DATA_DIR / filename, data_dir / filename)
+
+    first = GameData.from_directory(data_dir, cache_dir)
+    cached = GameData.from_directory(data_dir, cache_dir)
+    assert len(list(cache_dir.glob("*.pickle"))) == 1
+    assert cached.version == first.version
+    assert cached.buildings == first.buildings
+    assert set(cached.adjacency_programs) == set(first.adjacency_programs)
+
+    buildings = json.loads((data_dir / "buildings.json").read_text())
+    buildings["hut"] = {"yields": {"food": 1}}
+    (data_dir / "buildings.json").write_text(json.dumps(buildings))
+
+    rebuilt = GameData.from_directory(data_dir, cache_dir)
+    assert rebuilt.version != first.version
+    assert "hut" in rebuilt.buildings
+    assert len(list(cache_dir.glob("*.pickle"))) == 1
+
+def test_compiled_cache_is_keyed_on_the_compiler(tmp_path, monkeypatch):
+    """A different compiler or YIELD_ORDER never loads an older pickle."""
+    from backend import game_data
+
+    cache_dir = tmp_path / "cache"
+    GameData.from_directory(cache_dir=cache_dir)
+    [first] = cache_dir.glob("*.pickle")
+
+    monkeypatch.setattr(game_data, "_COMPILER_VERSION", "0" * 64)
+    GameData.from_directory(cache_dir=cache_dir)
+    [rebuilt] = cache_dir.glob("*.pickle")
+    assert rebuilt != first
+    assert rebuilt.name.startswith("game_data-" + "0" * 16)
@@ -0,0 +1,56 @@
+from backend.hex_topology import cube_distance, cube_to_ring, get_topology, ring_size
+
+def test_ring_cube_round_trip():
+    """Every (ring, index) maps to a unique cube coordinate at distance ring."""
+    topology = get_topology(5)
+    assert len(topology.positions) == sum(ring_size(r) for r in range(6))
+    assert len(set(topology.cubes)) == len(topology.positions)
+    for (ring, index), cube in zip(topology.positions, topology.cubes):
+        assert sum(cube) == 0
+        assert cube_distance(cube, (0, 0, 0)) == ring
+        assert cube_to_ring(cube) == (ring, index)
+
+def test_neighbour_counts():
+    """Inner tiles have 6 neighbours; consecutive ring tiles touch."""
+    topology = get_topology(3)
+    for pos in topology.positions:
+        if pos[0] < 3:
+            assert len(topology.neighbours(pos)) == 6
+    for ring in range(1, 4):
+        tiles = topology.ring(ring)
+        for a, b in zip(tiles, tiles[1:] + tiles[:1]):
+            assert b in topology.neighbours(a)
+    # Outer corner tiles only keep 3 neighbours inside the disk
+    assert len(topology.neighbours((3, 0))) == 3
+
+def test_distance_matrix_and_disk():
+    """The distance matrix agrees with cube arithmetic and drives disk queries."""
+    topology = get_topology(3)
+    for a, ca in zip(topology.positions, topology.cubes):
+        for b, cb in zip(topology.positions, topology.cubes):
+            assert topology.distance[topology.index[a], topology.index[b]] == cube_distance(ca, cb)
+    assert set(topology.disk((0, 0), 1)) == {(0, 0)} | set(topology.ring(1))
+    assert len(topology.disk((0, 0), 3)) == 37
+
+def test_topology_is_shared():
+    assert get_topology(3) is get_topology(3)
+
+def test_large_topology_is_linear():
+    """Big disks build without the all-pairs distance matrix."""
+    topology = get_topology(30)
+    assert topology.n_tiles == 1 + 3 * 30 * 31
+    assert "distance" not in topology.__dict__
+    assert len(topology.disk((0, 0), 2)) == 19
+    assert len(topology.disk((30, 0), 1)) == 4
+    assert topology.tile_distance((30, 0), (30, 90)) == 60
+
+def test_symmetries_preserve_adjacency():
+    """All 12 rotations/reflections are distinct, fix the center and keep neighbours adjacent."""
+    topology = get_topology(3)
+    assert len(set(topology.symmetries)) == 12
+    assert topology.symmetries[0] == tuple(range(topology.n_tiles))
+    for symmetry in topology.symmetries:
+        assert symmetry[0] == 0
+        for t, pos in enumerate(topology.positions):
+            moved = {topology.positions[symmetry[topology.index[n]]] for n in topology.neighbours(pos)}
+            assert moved == set(topology.neighbours(topology.positions[symmetry[t]]))
@@ -0,0 +1,68 @@
+import time
+import pytest
+from backend.city_layout import CityLayout
+from backend.jobs import CANCELLED, DONE, FAILED, RUNNING, JobQueue, QueueFull
+from backend.optimizer import CityOptimizer
+
+SLOW_BUILDINGS = ["market", "bank", "arena", "pavilion", "blacksmith", "library", "market"]
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(max_workers=1, max_pending=2)
+    yield queue
+    queue.shutdown()
+
+def wait_for(job, statuses, timeout=30.0):
+    deadline = time.time() + timeout
+    while job.status not in statuses:
+        assert time.time() < deadline, f"job still {job.status}"
+        time.sleep(0.01)
+
+def slow_job(queue):
+    city = CityLayout()
+    for ring in (1, 2):
+        for i in range(6 * ring):
+            city.set_tile_terrain(ring, i, "plains_flat", [], False)
+    optimizer = CityOptimizer(city)
+    run = lambda: optimizer.optimize_multiple_buildings(SLOW_BUILDINGS, {"gold": 1.0}, prune=False)
+    return city, queue.submit(optimizer, run)
+
+def test_job_runs_to_completion(queue):
+    city = CityLayout()
+    city.set_tile_terrain(1, 0, "coast", [], True)
+    optimizer = CityOptimizer(city)
+    job = queue.submit(optimizer, lambda: [r.position for r in optimizer.optimize_multiple_buildings(["market"])])
+
+    assert job.wait(timeout=30)
+    assert job.status == DONE and job.result and job.error is None and job.finished is not None
+    assert job.progress["best_score"] is not None
+    assert queue.get(job.id).to_dict()["status"] == DONE
+
+def test_cancel_running_job_reports_progress(queue):
+    city, job = slow_job(queue)
+    deadline = time.time() + 30
+    while job.progress["nodes_explored"] == 0:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    assert job.status == RUNNING
+
+    queue.cancel(job.id)
+    wait_for(job, [CANCELLED])
+    assert job.result is None and job.progress["nodes_explored"] > 0
+    # The search took its placements back off the layout
+    assert not any(tile.buildings for tile in city.tiles.values())
+
+def test_queue_bound_and_queued_cancel(queue):
+    _, running = slow_job(queue)
+    _, queued = slow_job(queue)
+    with pytest.raises(QueueFull):
+        slow_job(queue)
+
+    # A queued job is cancelled without ever running, which frees its place
+    queue.cancel(queued.id)
+    assert queued.status == CANCELLED
+    failing = queue.submit(CityOptimizer(CityLayout()), lambda: 1 / 0)
+    queue.cancel(running.id)
+    wait_for(failing, [FAILED])
+    assert "division" in failing.error
+    assert queue.cancel("no-such-job") is None
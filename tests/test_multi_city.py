@@ -0,0 +1,78 @@
+import pytest
+from backend.city_layout import CityLayout
+from backend.multi_city import CityPlan, MultiCityOptimizer
+from backend.optimizer import CityOptimizer
+
+PRIORITIES = {"gold": 1.0, "culture": 0.5, "happiness": 0.5}
+
+def make_board():
+    """A radius-8 board with coast and plains scattered around."""
+    board = CityLayout(radius=8, reserved=[])
+    for k, pos in enumerate(board.topology.positions):
+        if k % 3 == 0:
+            board.set_tile_terrain(pos[0], pos[1], "coast", [], True)
+        elif k % 3 == 1:
+            board.set_tile_terrain(pos[0], pos[1], "plains_flat", [], False)
+    return board
+
+def test_clusters_follow_overlapping_territory():
+    """Overlapping cities are solved together, distant ones apart."""
+    board = make_board()
+    optimizer = MultiCityOptimizer(board)
+    a = CityPlan("a", (8, 0), ["market"])
+    b = CityPlan("b", (6, 0), ["market"])
+    c = CityPlan("c", (8, 24), ["market"])
+    assert optimizer.clusters([a, b, c]) == [[0, 1], [2]]
+
+def test_buildings_stay_in_their_territory():
+    """Every placement lies inside its own city's territory."""
+    board = make_board()
+    plans = [
+        CityPlan("a", (8, 0), ["market", "bank", "library"]),
+        CityPlan("b", (6, 0), ["market", "arena"]),
+        CityPlan("c", (8, 24), ["market", "bank"]),
+    ]
+    result = MultiCityOptimizer(board).optimize(plans, PRIORITIES)
+    assert [sorted(c) for c in result.clusters] == [["a", "b"], ["c"]]
+    for plan in plans:
+        territory = set(board.topology.disk(plan.center, plan.radius))
+        for placed in result.placements[plan.name]:
+            assert placed.position in territory
+    assert sum(len(v) for v in result.placements.values()) > 0
+    # The search leaves the board as it found it
+    assert all(not tile.buildings for tile in board.tiles.values())
+
+def test_independent_city_matches_single_city_search():
+    """A city with no overlap scores what a restricted single search scores."""
+    board = make_board()
+    plan = CityPlan("c", (8, 24), ["market", "bank", "library"])
+    multi = MultiCityOptimizer(board)
+    result = multi.optimize([plan], PRIORITIES)
+
+    single = CityOptimizer(board)
+    mask = multi.territory_mask(plan)
+    single.optimize_multiple_buildings(plan.buildings, PRIORITIES, tile_masks=[mask] * 3)
+    assert result.score == pytest.approx(single.best_score)
+    assert [(r.building, r.position) for r in result.placements["c"]] == single.best_arrangement
+
+def test_parallel_clusters_match_serial():
+    """Solving clusters in a process pool gives the serial answer."""
+    board = make_board()
+    plans = [
+        CityPlan("a", (8, 0), ["market", "bank"]),
+        CityPlan("b", (8, 24), ["market", "library"]),
+    ]
+    serial = MultiCityOptimizer(board).optimize(plans, PRIORITIES)
+    parallel = MultiCityOptimizer(board).optimize(plans, PRIORITIES, workers=2)
+    assert parallel.score == pytest.approx(serial.score)
+    for name in ("a", "b"):
+        assert [(r.building, r.position) for r in parallel.placements[name]] == \
+               [(r.building, r.position) for r in serial.placements[name]]
+
+def test_plan_errors():
+    board = make_board()
+    optimizer = MultiCityOptimizer(board)
+    with pytest.raises(ValueError):
+        optimizer.optimize([CityPlan("a", (9, 0), ["market"])])
+    with pytest.raises(ValueError):
+        optimizer.optimize([CityPlan("a", (0, 0), []), CityPlan("a", (8, 0), [])])
@@ -1,6 +1,14 @@
+import random
 import pytest
 from backend.city_layout import CityLayout
-from backend.optimizer import CityOptimizer
+from backend.optimizer import CityOptimizer, SearchCancelled
+
+def make_city(tiles):
+    """A fresh layout with terrain on each (ring, index, terrain, fresh_water) tile"""
+    city = CityLayout()
+    for ring, index, terrain, fresh_water in tiles:
+        city.set_tile_terrain(ring, index, terrain, [], fresh_water)
+    return city
 
 @pytest.fixture
 def city():
@@ -75,4 +83,290 @@ def test_yield_priorities(optimizer, city):
     )
     
     # Should get different scores based on priorities
-    assert result_gold.score != result_food.score
\ No newline at end of file
+    assert result_gold.score != result_food.score
+
+def test_branch_and_bound_matches_exhaustive_search():
+    """Pruned search should return the same arrangement as the full search"""
+    tiles = [
+        (0, 0, "plains_flat", True),
+        (1, 0, "coast", True),
+        (1, 1, "mountain", False),
+        (1, 2, "plains_flat", False),
+        (1, 3, "plains_flat", False),
+    ]
+
+    buildings = ["market", "bank", "arena", "pavilion"]
+    priorities = {"gold": 1.0, "happiness": 0.8, "culture": 0.5}
+
+    full = CityOptimizer(make_city(tiles))
+    full_results = full.optimize_multiple_buildings(buildings, priorities, prune=False)
+
+    pruned = CityOptimizer(make_city(tiles))
+    pruned_results = pruned.optimize_multiple_buildings(buildings, priorities)
+
+    assert pruned.best_score == full.best_score
+    assert pruned.best_arrangement == full.best_arrangement
+    assert [r.position for r in pruned_results] == [r.position for r in full_results]
+    assert full.pruned_nodes == 0
+    assert pruned.pruned_nodes > 0
+
+def test_branch_and_bound_on_a_full_layout():
+    """Eight buildings on a layout with terrain on every tile are solved in a few thousand nodes"""
+    rng = random.Random(5)
+    terrains = ["plains_flat", "coast", "mountain", "grassland_flat", "desert_flat", "plains_rough", "tundra_flat"]
+    city = CityLayout()
+    for ring, index in city.tiles:
+        city.set_tile_terrain(ring, index, rng.choice(terrains), [], rng.random() < 0.3)
+
+    buildings = ["market", "bank", "arena", "library", "academy", "pavilion", "altar", "villa"]
+    priorities = {"gold": 1.0, "happiness": 1.0, "science": 1.0, "culture": 1.0}
+
+    node_limit = 10000
+    optimizer = CityOptimizer(city)
+
+    # Past the node limit the search is cancelled, which fails the test
+    def stop_at_limit(search):
+        if search.nodes_explored > node_limit:
+            search.cancel()
+
+    optimizer.progress_callback = stop_at_limit
+    optimizer.optimize_multiple_buildings(buildings, priorities)
+
+    assert optimizer.nodes_explored <= node_limit
+    assert len(optimizer.best_arrangement) == len(buildings)
+    assert optimizer.pruned_nodes > 0
+
+    annealed = CityOptimizer(city)
+    annealed.optimize_multiple_buildings(buildings, priorities, strategy="local_search", time_budget_ms=200, seed=0)
+    assert annealed.best_score <= optimizer.best_score + CityOptimizer.SCORE_EPSILON
+
+def test_running_score_matches_full_rescore():
+    """The incremental score kept during search should equal a full re-score"""
+    city = CityLayout()
+    city.set_tile_terrain(1, 0, "coast", [], True)
+    city.set_tile_terrain(1, 1, "coast", [], True)
+    city.set_tile_terrain(1, 2, "mountain", [], False)
+    city.set_tile_terrain(1, 3, "plains_flat", [], False)
+    city.add_building(1, 3, "arena")  # pre-existing building shares its bonus
+
+    optimizer = CityOptimizer(city)
+    priorities = {"gold": 1.0, "happiness": 1.0}
+    optimizer.optimize_multiple_buildings(["bank", "guildhall", "pavilion"], priorities)
+
+    for (bldg, (ring, idx)) in optimizer.best_arrangement:
+        city.add_building(ring, idx, bldg)
+    rescored = optimizer._score_entire_arrangement(optimizer.best_arrangement, priorities)
+    assert optimizer.best_score == pytest.approx(rescored)
+
+def test_local_search_strategy():
+    """Annealing should respect placement rules and find the small-case optimum"""
+    tiles = [
+        (1, 0, "coast", True),
+        (1, 1, "mountain", False),
+        (1, 2, "plains_flat", False),
+        (1, 3, "coast", True),
+    ]
+
+    buildings = ["market", "bank", "arena", "shipyard", "market"]
+    priorities = {"gold": 1.0, "happiness": 1.0, "production": 1.0}
+
+    exact = CityOptimizer(make_city(tiles))
+    exact.optimize_multiple_buildings(buildings, priorities)
+
+    city = make_city(tiles)
+    heuristic = CityOptimizer(city)
+    results = heuristic.optimize_multiple_buildings(
+        buildings, priorities, strategy="local_search", time_budget_ms=200, seed=7
+    )
+
+    assert heuristic.best_score == pytest.approx(exact.best_score)
+    # Layout is left untouched and every placement is legal
+    assert all(not tile.buildings for tile in city.tiles.values())
+    for r in results:
+        assert city.is_valid_building_location(r.position[0], r.position[1], r.building)
+    positions = [r.position for r in results]
+    assert all(positions.count(p) <= 2 for p in positions)
+
+def test_local_search_keeps_the_undo_trail():
+    """A caller's place() history survives a local-search run on its layout"""
+    city = make_city([(1, 0, "coast", True), (1, 1, "plains_flat", False), (1, 2, "coast", True)])
+    empty_hash = city.zobrist_hash
+    assert city.place(1, 1, "market")
+    placed_hash = city.zobrist_hash
+
+    optimizer = CityOptimizer(city)
+    optimizer.optimize_multiple_buildings(["bank", "arena"], {"gold": 1.0, "happiness": 1.0},
+                                          strategy="local_search", time_budget_ms=50, seed=0)
+
+    assert city.zobrist_hash == placed_hash
+    assert city.undo()
+    assert city.buildings_at(1, 1) == []
+    assert city.zobrist_hash == empty_hash
+    assert not city.undo()
+
+def test_unknown_strategy(optimizer):
+    with pytest.raises(ValueError):
+        optimizer.optimize_multiple_buildings(["market"], strategy="genetic")
+
+def test_parallel_search_matches_serial():
+    """Process-pool search should return exactly the serial answer"""
+    tiles = [
+        (0, 0, "plains_flat", True),
+        (1, 0, "coast", True),
+        (1, 1, "mountain", False),
+        (1, 2, "plains_flat", False),
+        (2, 3, "coast", True),
+    ]
+
+    buildings = ["market", "arena", "bank", "pavilion"]
+    priorities = {"gold": 1.0, "happiness": 1.0, "culture": 1.0}
+
+    serial = CityOptimizer(make_city(tiles))
+    serial.optimize_multiple_buildings(buildings, priorities)
+
+    city = make_city(tiles)
+    parallel = CityOptimizer(city)
+    parallel.optimize_multiple_buildings(buildings, priorities, workers=2)
+
+    assert parallel.best_score == serial.best_score
+    assert parallel.best_arrangement == serial.best_arrangement
+    assert all(not tile.buildings for tile in city.tiles.values())
+
+def test_transposition_table_with_duplicate_buildings():
+    """Repeated states from duplicate buildings are skipped without changing the answer"""
+    tiles = [
+        (1, 0, "coast", True),
+        (1, 1, "coast", True),
+        (1, 2, "plains_flat", False),
+    ]
+
+    buildings = ["market", "market", "bank", "bank"]
+    priorities = {"gold": 1.0}
+
+    plain = CityOptimizer(make_city(tiles))
+    plain.break_symmetry = False
+    plain.TRANSPOSITION_TABLE_SIZE = 0  # every entry evicted immediately
+    plain.optimize_multiple_buildings(buildings, priorities, prune=False)
+
+    memo = CityOptimizer(make_city(tiles))
+    memo.break_symmetry = False  # symmetry breaking alone removes these repeats
+    memo.optimize_multiple_buildings(buildings, priorities, prune=False)
+
+    assert plain.transposition_hits == 0
+    assert memo.transposition_hits > 0
+    assert memo.best_arrangement == plain.best_arrangement
+    assert memo.best_score == plain.best_score
+
+    # Copies linked by symmetry breaking never repeat a state: no table
+    linked = CityOptimizer(make_city(tiles))
+    linked.optimize_multiple_buildings(buildings, priorities, prune=False)
+    assert linked._transpositions is None
+    assert linked.best_score == plain.best_score
+
+    # Copies with different tile masks are not linked, so they still can
+    masked = CityOptimizer(make_city(tiles))
+    everywhere = (1 << len(masked.city.tiles)) - 1
+    masked.optimize_multiple_buildings(buildings, priorities, prune=False,
+                                       tile_masks=[everywhere, -1, -1, -1])
+    assert masked._transpositions is not None
+    assert masked.transposition_hits > 0
+    assert masked.best_score == plain.best_score
+
+def test_symmetry_breaking_for_interchangeable_buildings(optimizer):
+    """Copies and yield-identical buildings are linked; the optimum is unchanged"""
+    links = optimizer._symmetry_links(["market", "kiln", "market", "amphitheater", "bank", "bank"])
+    # market copies, kiln ~ amphitheater (same yields, no quarter bonus), bank copies
+    assert links == [-1, -1, 0, 1, -1, 4]
+    # arena has a quarter bonus, so it is only interchangeable with itself
+    assert optimizer._symmetry_links(["arena", "altar"]) == [-1, -1]
+
+    tiles = [
+        (1, 0, "mountain", False),
+        (1, 1, "plains_flat", False),
+        (1, 2, "coast", True),
+        (2, 2, "plains_flat", False),
+    ]
+
+    buildings = ["kiln", "market", "amphitheater", "market", "kiln"]
+    priorities = {"culture": 1.0, "gold": 0.7}
+
+    full = CityOptimizer(make_city(tiles))
+    full.break_symmetry = False
+    full.TRANSPOSITION_TABLE_SIZE = 0
+    full.optimize_multiple_buildings(buildings, priorities, prune=False)
+
+    broken = CityOptimizer(make_city(tiles))
+    broken.optimize_multiple_buildings(buildings, priorities, prune=False)
+
+    assert broken.best_arrangement == full.best_arrangement
+    assert broken.best_score == pytest.approx(full.best_score)
+
+def test_rank_building_placements(optimizer, city):
+    """Ranking lists valid free tiles best first, with tile-partner bonuses"""
+    city.set_tile_terrain(1, 0, "mountain", [], False)
+    for i in range(1, 6):
+        city.set_tile_terrain(1, i, "plains_flat", [], False)
+
+    ranked = optimizer.rank_building_placements("arena", {"happiness": 1.0}, top_k=3)
+    assert [r.position for r in ranked] == [(1, 1), (1, 5), (1, 2)]
+    assert [r.score for r in ranked] == sorted((r.score for r in ranked), reverse=True)
+    assert all(r.position not in [(0, 0), (1, 0)] for r in ranked)
+
+    # Joining a partner forms a quarter (own bonus plus the partner's); a full tile drops out
+    city.add_building(1, 3, "bank")
+    ranked = optimizer.rank_building_placements("arena", {"happiness": 1.0, "gold": 1.0}, top_k=6)
+    scores = {r.position: r.score for r in ranked}
+    assert scores[(1, 3)] == scores[(1, 2)] + 2
+    for r in ranked:
+        assert r.yields == city.calculate_building_yields(r.position[0], r.position[1], "arena")
+
+    city.add_building(1, 3, "market")
+    assert (1, 3) not in [r.position for r in optimizer.rank_building_placements("arena", top_k=6)]
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"workers": 2},
+    {"strategy": "local_search", "time_budget_ms": 10000},
+])
+def test_cancel_mid_search(optimizer, city, options):
+    """A cancelled search raises and leaves the layout as it was"""
+    for i in range(6):
+        city.set_tile_terrain(1, i, "plains_flat", [], False)
+    city.add_building(1, 0, "library")
+    calls = []
+
+    def progress(opt):
+        calls.append(opt.nodes_explored)
+        opt.cancel()
+
+    optimizer.progress_callback = progress
+    buildings = ["market", "bank", "arena", "pavilion", "blacksmith", "library", "market"]
+    with pytest.raises(SearchCancelled):
+        optimizer.optimize_multiple_buildings(buildings, {"gold": 1.0}, prune=False, **options)
+
+    assert optimizer.cancelled and len(calls) == 1
+    assert {pos: tile.buildings for pos, tile in city.tiles.items() if tile.buildings} == {(1, 0): ["library"]}
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"workers": 2},
+    {"strategy": "local_search", "time_budget_ms": 50, "seed": 1},
+])
+def test_incumbent_callback_reports_improvements(optimizer, city, options):
+    """Each reported arrangement beats (or canonically precedes) the previous one; the last is the answer"""
+    city.set_tile_terrain(1, 0, "mountain", [], False)
+    for i in range(1, 6):
+        city.set_tile_terrain(1, i, "plains_flat", [], False)
+    seen = []
+    optimizer.incumbent_callback = lambda score, arrangement: seen.append((score, list(arrangement)))
+
+    buildings = ["arena", "market", "bank"]
+    results = optimizer.optimize_multiple_buildings(buildings, {"happiness": 1.0, "gold": 1.0}, **options)
+
+    assert seen
+    scores = [score for score, _ in seen]
+    # A tie is reported again when it settles on a canonically earlier arrangement
+    assert scores == sorted(scores)
+    assert seen[-1][0] == pytest.approx(optimizer.best_score)
+    assert seen[-1][1] == [(r.building, r.position) for r in results]
+    assert optimizer.arrangement_results(optimizer.best_arrangement, {"happiness": 1.0, "gold": 1.0}) == results
@@ -0,0 +1,149 @@
+import os
+import threading
+import pytest
+from backend.city_layout import CityLayout
+from backend.optimizer import CityOptimizer
+from backend.result_cache import ResultCache, cached_optimize, request_key
+from backend.singleflight import Singleflight
+
+def make_city():
+    city = CityLayout()
+    city.set_tile_terrain(1, 0, "coast", [], True)
+    city.set_tile_terrain(1, 1, "mountain", [], False)
+    city.set_tile_terrain(1, 2, "plains_flat", [], False)
+    city.set_tile_terrain(1, 3, "plains_flat", ["forest"], False)
+    return city
+
+def test_equivalent_requests_share_a_key():
+    city = make_city()
+    key = request_key(city, ["market", "arena"], {"gold": 1.0, "happiness": 0.5}, ("backtracking",))
+    # Building order and priority scale do not matter
+    assert key == request_key(city, ["arena", "market"], {"gold": 4.0, "happiness": 2.0}, ("backtracking",))
+    assert key != request_key(city, ["arena", "arena"], {"gold": 1.0, "happiness": 0.5}, ("backtracking",))
+    assert key != request_key(city, ["market", "arena"], {"gold": 1.0}, ("backtracking",))
+
+    city.add_building(1, 3, "library")
+    assert key != request_key(city, ["market", "arena"], {"gold": 1.0, "happiness": 0.5}, ("backtracking",))
+
+def test_hit_rescores_for_the_caller():
+    cache = ResultCache()
+    city = make_city()
+    first, _, hit = cached_optimize(cache, city, ["market", "arena"], {"gold": 1.0, "happiness": 1.0})
+    assert not hit
+    again, _, hit = cached_optimize(cache, city, ["arena", "market"], {"gold": 3.0, "happiness": 3.0})
+    assert hit
+    assert [r.building for r in again] == ["arena", "market"]
+    assert sum(r.score for r in again) == pytest.approx(3 * sum(r.score for r in first))
+
+    fresh = CityOptimizer(make_city()).optimize_multiple_buildings(["market", "arena"], {"gold": 1.0, "happiness": 1.0})
+    assert [(r.building, r.position, r.score) for r in first] == [(r.building, r.position, r.score) for r in fresh]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_lru_eviction_respects_byte_cap():
+    cache = ResultCache(max_bytes=100)
+    cache.put("a", "x" * 40)
+    cache.put("b", "y" * 40)
+    assert cache.get("a") is not None  # "a" is now most recent
+    cache.put("c", "z" * 40)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1 and cache.stats()["bytes"] <= 100
+
+    cache.put("huge", "w" * 500)  # larger than the cap: never kept
+    assert cache.get("huge") is None
+
+def test_disk_tier_survives_restart(tmp_path):
+    cache = ResultCache(disk_dir=tmp_path)
+    cached_optimize(cache, make_city(), ["market"], {"gold": 1.0})
+
+    restarted = ResultCache(disk_dir=tmp_path)
+    results, _, hit = cached_optimize(restarted, make_city(), ["market"], {"gold": 1.0})
+    assert hit and results[0].building == "market"
+    assert restarted.stats()["disk_hits"] == 1 and restarted.stats()["entries"] == 1
+
+def test_disk_tier_is_capped(tmp_path):
+    cache = ResultCache(disk_dir=tmp_path, max_disk_bytes=400)
+    for age, key in enumerate(["a1", "b2", "c3", "d4"]):
+        cache.put(key, "x" * 90)
+        os.utime(tmp_path / key[:2] / f"{key}.json", (1000 + age, 1000 + age))
+    assert cache.stats()["disk_evictions"] == 0
+    cache.clear()
+    assert cache.get("a1") is not None  # a disk hit makes "a1" recent again
+
+    cache.put("e5", "x" * 90)
+    files = sorted(p.stem for p in tmp_path.glob("*/*.json"))
+    assert sum(p.stat().st_size for p in tmp_path.glob("*/*.json")) <= 300
+    assert "a1" in files and "e5" in files and "b2" not in files
+    assert cache.stats()["disk_evictions"] == 2
+
+def test_unseeded_local_search_is_not_cached():
+    cache = ResultCache()
+    for _ in range(2):
+        _, _, hit = cached_optimize(cache, make_city(), ["market"], {"gold": 1.0},
+                                    strategy="local_search", time_budget_ms=20)
+        assert not hit
+    assert cache.stats()["entries"] == 0
+
+    _, _, hit = cached_optimize(cache, make_city(), ["market"], {"gold": 1.0},
+                                strategy="local_search", time_budget_ms=20, seed=3)
+    assert not hit and cache.stats()["entries"] == 1
+
+def test_hit_builds_no_yield_table():
+    cache = ResultCache()
+    cached_optimize(cache, make_city(), ["market"], {"gold": 1.0})
+    optimizer = CityOptimizer(make_city())
+    _, _, hit = cached_optimize(cache, optimizer.city, ["market"], {"gold": 1.0}, optimizer=optimizer)
+    assert hit and optimizer._table is None
+
+def transformed(city, g):
+    """`city` moved by symmetry `g` of its topology."""
+    twin = CityLayout()
+    symmetry = city.topology.symmetries[g]
+    for t, (pos, tile) in enumerate(city.tiles.items()):
+        ring, index = city.topology.positions[symmetry[t]]
+        twin.set_tile_terrain(ring, index, tile.terrain_type, tile.features, tile.has_fresh_water)
+    return twin
+
+@pytest.mark.parametrize("g", [1, 4, 6, 9])
+def test_rotated_and_mirrored_layouts_share_results(g):
+    """A rotated or mirrored layout hits the cache and gets positions in its own orientation."""
+    cache = ResultCache()
+    city = make_city()
+    buildings, priorities = ["market", "arena", "library"], {"gold": 1.0, "happiness": 1.0, "science": 1.0}
+    first, _, _ = cached_optimize(cache, city, buildings, priorities)
+
+    twin = transformed(city, g)
+    assert request_key(twin, buildings, priorities, ("backtracking",)) == \
+        request_key(city, buildings, priorities, ("backtracking",))
+    results, _, hit = cached_optimize(cache, twin, buildings, priorities)
+    assert hit
+
+    symmetry = city.topology.symmetries[g]
+    placed = CityOptimizer(twin).arrangement_results([(r.building, r.position) for r in results], priorities)
+    for before, after, expected in zip(first, results, placed):
+        assert after.position == city.topology.positions[symmetry[city.topology.index[before.position]]]
+        assert after.yields == expected.yields
+    fresh = CityOptimizer(twin).optimize_multiple_buildings(buildings, priorities)
+    assert sum(r.score for r in results) == pytest.approx(sum(r.score for r in fresh))
+
+def test_concurrent_identical_requests_share_one_search():
+    cache = ResultCache()
+    flight = Singleflight()
+    requests = [(["market", "arena"], {"gold": 1.0, "happiness": 1.0}),
+                (["arena", "market"], {"gold": 2.0, "happiness": 2.0})] * 3
+    outcomes = [None] * len(requests)
+
+    def call(i):
+        buildings, priorities = requests[i]
+        outcomes[i] = cached_optimize(cache, make_city(), buildings, priorities, flight=flight)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Exactly one caller searched; the rest shared its flight or hit the cache
+    assert sum(not hit for _, _, hit in outcomes) == 1
+    for (buildings, _), (results, _, _) in zip(requests, outcomes):
+        assert [r.building for r in results] == buildings
@@ -0,0 +1,109 @@
+import multiprocessing
+import threading
+import time
+import pytest
+from backend.singleflight import Singleflight
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.005)
+
+def run_callers(flight, key, fn, n):
+    outcomes = [None] * n
+
+    def call(i):
+        try:
+            outcomes[i] = flight.do(key, fn)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+def test_concurrent_callers_share_one_run():
+    flight = Singleflight()
+    release = threading.Event()
+    runs = []
+
+    def compute():
+        runs.append(1)
+        release.wait()
+        return "answer"
+
+    threads, outcomes = run_callers(flight, "k", compute, 4)
+    wait_until(lambda: flight.stats()["shared"] == 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(runs) == 1
+    assert sorted(outcomes) == [("answer", False)] + [("answer", True)] * 3
+    assert flight.stats() == {"leaders": 1, "shared": 3, "in_flight": 0}
+    # Finished flights are forgotten: the next call runs again
+    assert flight.do("k", lambda: "again") == ("again", False)
+
+def test_errors_reach_every_waiter():
+    flight = Singleflight()
+    release = threading.Event()
+
+    def fail():
+        release.wait()
+        raise ValueError("no luck")
+
+    threads, outcomes = run_callers(flight, "k", fail, 3)
+    wait_until(lambda: flight.stats()["shared"] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert all(isinstance(o, ValueError) for o in outcomes)
+    assert flight.stats()["in_flight"] == 0
+
+def _hold_host_lock(lock_dir, key, holding, marker):
+    def compute():
+        holding.set()
+        time.sleep(0.3)
+        marker.write_text("done")
+    Singleflight(lock_dir).do(key, compute)
+
+@pytest.mark.skipif(Singleflight("x").lock_dir is None, reason="needs fcntl")
+def test_other_processes_wait_for_the_host_lock(tmp_path):
+    marker = tmp_path / "marker"
+    holding = multiprocessing.Event()
+    other = multiprocessing.Process(target=_hold_host_lock, args=(tmp_path, "k", holding, marker))
+    other.start()
+    assert holding.wait(10)
+
+    # Runs only once the other process's identical call has finished
+    value, shared = Singleflight(tmp_path).do("k", lambda: marker.read_text())
+    other.join()
+    assert (value, shared) == ("done", False)
+    assert not list(tmp_path.glob("*/*.lock"))
+
+@pytest.mark.skipif(Singleflight("x").lock_dir is None, reason="needs fcntl")
+def test_host_lock_files_are_removed_without_losing_exclusion(tmp_path):
+    """Lock files are deleted after each run, and holders still never overlap."""
+    active, overlaps = [], []
+
+    def compute():
+        active.append(1)
+        overlaps.append(len(active))
+        time.sleep(0.01)
+        active.pop()
+
+    def call():
+        # Separate instances lock through the file, like separate processes
+        for _ in range(5):
+            Singleflight(tmp_path).do("k", compute)
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(overlaps) == 20 and max(overlaps) == 1
+    assert not list(tmp_path.glob("*/*.lock"))
@@ -0,0 +1,76 @@
+import pickle
+import pytest
+from backend.city_layout import CityLayout
+from backend.tile_store import BUILDING_CODES, FEATURE_CODES, TileStore
+
+def test_buildings_fill_slots_and_keep_order():
+    """Removing a building shifts the later ones down, so add order is kept."""
+    store = TileStore(3)
+    assert store.add_building(1, "market") == (0, 1)
+    assert store.add_building(1, "market") == (1, 2)
+    with pytest.raises(ValueError):
+        store.add_building(1, "bank")
+
+    assert store.remove_building(1, "bank") is None
+    assert store.remove_building(1, "market") == (1, 1)
+    assert store.add_building(1, "bank") == (0, 2)
+    assert store.building_names(1) == ["market", "bank"]
+    assert store.remove_building(1, "market") == (0, 1)
+    assert store.building_names(1) == ["bank"]
+    assert store.building_names(0) == [] and store.building_count(2) == 0
+
+def test_terrain_and_features_round_trip():
+    store = TileStore(2)
+    store.set_terrain(0, "grassland_flat", ["forest", "river"], True)
+    assert store.terrain_name(0) == "grassland_flat"
+    assert sorted(store.feature_names(0)) == ["forest", "river"]
+    assert store.has_fresh_water(0)
+    assert store.terrain_name(1) == "" and store.feature_names(1) == []
+
+def test_pickle_recodes_names():
+    """Codes differ between processes; a pickle decodes to the same names."""
+    store = TileStore(2)
+    store.set_terrain(1, "desert_flat", ["oasis"], True)
+    store.add_building(1, "library")
+    state = store.__getstate__()
+
+    # Simulate a process that interned names in a different order
+    state["feature_names"] = ["unused_feature"] + state["feature_names"]
+    state["building_names"] = ["unused_building"] + state["building_names"]
+    store.features[1] <<= 1
+    store.buildings[2] += 1
+    state["buffer"] = bytes(store._buffer)
+
+    copy = TileStore.__new__(TileStore)
+    copy.__setstate__(state)
+    assert copy.terrain_name(1) == "desert_flat"
+    assert copy.feature_names(1) == ["oasis"]
+    assert copy.building_names(1) == ["library"]
+    assert copy.building_names(0) == []
+    assert "unused_feature" in FEATURE_CODES.codes and "unused_building" in BUILDING_CODES.codes
+
+def test_layout_clone_is_independent():
+    city = CityLayout()
+    city.set_tile_terrain(1, 0, "coast", ["reef"], True)
+    city.add_building(1, 0, "market")
+
+    twin = city.clone()
+    twin.add_building(1, 0, "bank")
+    twin.set_tile_terrain(1, 1, "tundra_flat", [], False)
+
+    assert city.get_tile(1, 0).buildings == ["market"]
+    assert twin.get_tile(1, 0).buildings == ["market", "bank"]
+    assert city.get_tile(1, 1).terrain_type == ""
+    assert not city.bitboard.full & (1 << city.bitboard.bit_index[(1, 0)])
+    assert twin.zobrist_hash != city.zobrist_hash
+
+def test_layout_pickle_keeps_tiles():
+    city = CityLayout()
+    city.set_tile_terrain(2, 3, "plains_hill", ["forest"], False)
+    city.add_building(2, 3, "granary")
+
+    copy = pickle.loads(pickle.dumps(city))
+    tile = copy.get_tile(2, 3)
+    assert (tile.terrain_type, tile.features, tile.buildings) == ("plains_hill", ["forest"], ["granary"])
+    assert copy.terrain_signature() == city.terrain_signature()
+    assert copy.zobrist_hash == city.zobrist_hash
@@ -0,0 +1,82 @@
+import pytest
+from backend.city_layout import CityLayout, YieldCalculator
+from backend.yield_table import YieldTable
+
+@pytest.fixture
+def city():
+    city = CityLayout()
+    city.set_tile_terrain(0, 0, "plains_flat", [], False)
+    city.set_tile_terrain(1, 0, "mountain", [], False)
+    city.set_tile_terrain(1, 1, "coast", [], True)
+    city.set_tile_terrain(1, 2, "plains_flat", [], False)
+    return city
+
+def test_table_matches_layout_yields(city):
+    """Static entries should equal base + adjacency from CityLayout"""
+    table = YieldTable(city, ["arena", "market", "shipyard"])
+    assert table.static.shape == (3, 37, len(YieldCalculator.YIELD_ORDER))
+
+    for building in table.buildings:
+        b = table.building_index[building]
+        for pos, t in table.position_index.items():
+            yields = city.calculate_building_yields(pos[0], pos[1], building)
+            expected = YieldCalculator.combine_yields(yields['base_yields'], yields['adjacency_yields'])
+            for k, yld in enumerate(table.yield_types):
+                assert table.static[b, t, k] == expected.get(yld, 0.0)
+
+def test_table_validity_mask(city):
+    """Validity follows placement requirements but ignores occupancy"""
+    table = YieldTable(city, ["shipyard", "arena", "nonexistent_building"])
+    assert table.buildings == ["shipyard", "arena"]
+
+    shipyard = table.building_index["shipyard"]
+    arena = table.building_index["arena"]
+    assert table.valid[shipyard, table.position_index[(1, 1)]]
+    assert not table.valid[shipyard, table.position_index[(1, 2)]]
+    assert not table.valid[arena, table.position_index[(2, 0)]]  # no terrain
+
+    city.add_building(1, 2, "arena")
+    city.add_building(1, 2, "market")
+    assert YieldTable(city, ["arena"]).valid[0, table.position_index[(1, 2)]]
+
+def test_static_scores(city):
+    """Scores weight static yields by priority; the quarter bonus is kept apart"""
+    table = YieldTable(city, ["arena"])
+    scores = table.static_scores({"happiness": 2.0})
+    # arena next to the mountain: (4 base + 1 adjacency) * 2
+    assert scores[0, table.position_index[(1, 1)]] == 10.0
+    assert table.quarter_scores({"happiness": 2.0})[0] == 2.0
+
+def test_cached_table_is_shared_per_layout(city):
+    """Layouts with the same terrain reuse one compiled table"""
+    from backend.yield_table import get_yield_table
+
+    twin = CityLayout()
+    for pos, tile in city.tiles.items():
+        twin.set_tile_terrain(pos[0], pos[1], tile.terrain_type, list(tile.features), tile.has_fresh_water)
+
+    table = get_yield_table(city)
+    assert get_yield_table(twin) is table
+    assert not table.static.flags.writeable
+
+    # Buildings don't change static yields; terrain does
+    twin.add_building(1, 2, "arena")
+    assert get_yield_table(twin) is table
+    twin.set_tile_terrain(2, 0, "mountain", [], False)
+    assert get_yield_table(twin) is not table
+
+    # Re-weighting needs no recomputation
+    gold = table.static_scores({"gold": 1.0})
+    food = table.static_scores({"food": 1.0})
+    assert gold.shape == food.shape == (len(table.buildings), 37)
+
+def test_region_boards_get_a_private_table(city):
+    """Only city-sized grids compile and share the all-building table"""
+    from backend.yield_table import get_yield_table, table_for
+
+    assert table_for(city, ["arena"]) is get_yield_table(city)
+
+    board = CityLayout(radius=8)
+    table = table_for(board, ["arena", "market", "arena"])
+    assert table.buildings == ["arena", "market"]
+    assert table_for(board, ["arena"]) is not table
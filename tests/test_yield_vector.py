@@ -0,0 +1,33 @@
+import pytest
+from backend.city_layout import CityLayout, YieldCalculator
+from backend.yield_vector import YIELD_ORDER, YieldVector
+
+def test_dict_round_trip_uses_fixed_order():
+    vector = YieldVector.from_dict({"science": 2, "food": 1, "not_a_yield": 5})
+    assert vector["science"] == 2.0 and vector[YIELD_ORDER.index("food")] == 1.0
+    assert list(vector.to_dict()) == list(YIELD_ORDER)
+    assert list(YieldCalculator.create_empty_yields()) == list(YIELD_ORDER)
+    with pytest.raises(ValueError):
+        YieldVector([1.0, 2.0])
+
+def test_in_place_arithmetic():
+    total = YieldVector.from_dict({"gold": 1})
+    same = total
+    total += YieldVector.from_dict({"gold": 2, "culture": 1})
+    total -= YieldVector.from_dict({"culture": 1})
+    total *= 2
+    assert total is same
+    assert total == YieldVector.from_dict({"gold": 6})
+
+    doubled = total + total
+    assert doubled["gold"] == 12 and total["gold"] == 6
+    assert total.dot(YieldVector.from_dict({"gold": 0.5})) == 3.0
+
+def test_building_yield_vectors_match_dicts():
+    city = CityLayout()
+    city.set_tile_terrain(1, 0, "coast", [], True)
+    city.add_building(1, 0, "garden")
+    vectors = city.building_yield_vectors(1, 0, "bath")
+    assert vectors.total == vectors.base + vectors.adjacency + vectors.quarter
+    assert city.calculate_building_yields(1, 0, "bath") == vectors.to_dict()
+    assert city.building_yield_vectors(1, 0, "not_a_building") is None